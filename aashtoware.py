@@ -1,13 +1,31 @@
+import os
+import json
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 import streamlit as st
-from streamlit_folium import st_folium
-import folium
-from agol_util import get_multiple_fields
-from agol_util import select_record
-from map import add_small_geocoder
+from apex_core.agol import get_multiple_fields, get_feature_count, get_last_edit_date, get_layer_info
+from apex_core.agol import select_record
+
+
+AWP_URL = (
+    "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/"
+    "AWP_PROJECTS_EXPORT_XYTableToPoint_ExportFeatures/FeatureServer"
+)
+AWP_FIELDS = ["Name", "ProposalId", "StateProjectNumber", "GlobalId"]
+AWP_CACHE_PATH = os.environ.get("APEX_AWP_CACHE", os.path.join(".cache", "awp_projects.json"))
+AWP_CHECK_INTERVAL = 300  # seconds between lastEditDate checks
+
+logger = logging.getLogger("aashtoware")
 
 
 
 def aashtoware_point(lat: float, lon: float):
+    # The map stack (folium, shapely, pyproj) is only loaded once a map is shown
+    from map import show_point_map
+
     st.write("")
     st.markdown("<h5>AASHTOWare Coordinates</h5>", unsafe_allow_html=True)
     st.write(
@@ -33,11 +51,8 @@ def aashtoware_point(lat: float, lon: float):
             key="awp_lon"
         )
 
-    # Create map centered on the coordinates
-    m = folium.Map(location=[lat, lon], zoom_start=10)
-    folium.Marker([lat, lon], icon=folium.Icon(color="blue"), tooltip="Uploaded Point").add_to(m)
-    add_small_geocoder(m)
-    st_folium(m, width=700, height=500)
+    # Map centered on the coordinates
+    show_point_map([[lat, lon]], zoom=10)
     
     # ✅ Update session_state if valid point
     if lat and lon:
@@ -48,28 +63,164 @@ def aashtoware_point(lat: float, lon: float):
 
 
 
-def aashtoware_project():
-    aashtoware = (
-        "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/"
-        "AWP_PROJECTS_EXPORT_XYTableToPoint_ExportFeatures/FeatureServer"
-    )
+@dataclass(frozen=True)
+class AWPSnapshot:
+    """One consistent version of the AWP project list, replaced as a whole on refresh."""
 
-    # Build <label> -> <GlobalID> mapping for the dropdown
-    projects = get_multiple_fields(
-        aashtoware, 0, ["Name", "ProposalId", "StateProjectNumber", "GlobalId"]
-    )
-    label_to_gid = {
-        f"{p.get('StateProjectNumber', '')} – {p.get('Name', '')}": p.get("GlobalID")
-        for p in projects
-        if p.get("GlobalID")
-    }
+    projects: dict = field(default_factory=dict)
+    last_edit: int = None
+    labels: list = field(default_factory=list)
+    label_to_gid: dict = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, projects: dict, last_edit: int):
+        """Precompute the dropdown labels and the label -> GlobalID map."""
+        label_to_gid = {
+            f"{p.get('StateProjectNumber', '')} – {p.get('Name', '')}": gid
+            for gid, p in projects.items()
+        }
+        # Sorted labels for a stable and deterministic order
+        return cls(projects, last_edit, sorted(label_to_gid.keys()), label_to_gid)
+
+
+class AWPProjectCache:
+    """
+    On-disk cache of the AASHTOWare project list, shared by every session in the process.
+
+    The list is downloaded once and then refreshed incrementally. The layer's
+    ``editingInfo.lastEditDate`` is checked at most every AWP_CHECK_INTERVAL
+    seconds. When it has changed, only rows edited since the last sync are
+    fetched. A full reload is done if the layer has no edit-date field or the
+    row count no longer matches (e.g. after deletes).
+
+    Readers take ``snapshot`` once and use its projects, labels and
+    label_to_gid together. A refresh builds a new AWPSnapshot off to the side
+    and publishes it with a single assignment, so readers never wait on AGOL
+    once a list is loaded.
+    """
+
+    def __init__(self, path: str = AWP_CACHE_PATH, url: str = AWP_URL, layer: int = 0):
+        self.path = path
+        self.url = url
+        self.layer = layer
+        self.snapshot = AWPSnapshot()
+        self._checked_at = 0.0
+        self._refresh_lock = threading.Lock()   # one refresh at a time
+        self._load()
+
+    def _load(self):
+        """Load the cache file written by a previous sync, if any."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.snapshot = AWPSnapshot.build(data.get("projects", {}), data.get("last_edit"))
+        except (OSError, ValueError):
+            self.snapshot = AWPSnapshot()
+
+    def _save(self, snapshot: AWPSnapshot):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"last_edit": snapshot.last_edit, "projects": snapshot.projects}, f)
+        os.replace(tmp_path, self.path)
+
+    def _fetch(self, where: str = "1=1") -> dict:
+        """Return the AWP rows matching ``where`` keyed by GlobalID."""
+        rows = get_multiple_fields(self.url, self.layer, AWP_FIELDS, max_workers=4, where=where)
+        return {p["GlobalID"]: p for p in rows if p.get("GlobalID")}
+
+    def _sync(self, snapshot: AWPSnapshot) -> AWPSnapshot:
+        """Return an up-to-date snapshot, or ``snapshot`` itself if the layer hasn't changed."""
+        last_edit = get_last_edit_date(self.url, self.layer)
+        if snapshot.projects and last_edit is not None and last_edit == snapshot.last_edit:
+            return snapshot
+
+        edit_field = get_layer_info(self.url, self.layer).get("editFieldsInfo", {}).get("editDateField")
+        full_reload = not (snapshot.projects and snapshot.last_edit and edit_field)
+
+        projects = None
+        if not full_reload:
+            since = datetime.fromtimestamp(snapshot.last_edit / 1000, tz=timezone.utc)
+            where = f"{edit_field} >= timestamp '{since:%Y-%m-%d %H:%M:%S}'"
+            # Update a copy; the published snapshot is never modified
+            projects = dict(snapshot.projects)
+            projects.update(self._fetch(where))
+            # Deleted rows can't be seen incrementally; reload if the counts disagree
+            full_reload = get_feature_count(self.url, self.layer) != len(projects)
+
+        if full_reload:
+            projects = self._fetch()
+
+        return AWPSnapshot.build(projects, last_edit)
+
+    def _is_due(self, snapshot: AWPSnapshot) -> bool:
+        return not snapshot.projects or time.time() - self._checked_at >= AWP_CHECK_INTERVAL
+
+    def refresh(self, force: bool = False):
+        """
+        Bring the cache up to date with the AWP export layer.
+
+        Only one thread refreshes at a time. While a list is loaded, other
+        callers return straight away and keep using it; with nothing loaded
+        yet they wait for the first download.
+
+        Args:
+            force (bool, optional): Skip the check interval and re-check the layer now.
+        """
+        snapshot = self.snapshot
+        if not force and not self._is_due(snapshot):
+            return
+        if not self._refresh_lock.acquire(blocking=not snapshot.projects):
+            return
+
+        try:
+            # Another thread may have refreshed while we waited on the lock
+            snapshot = self.snapshot
+            if not force and not self._is_due(snapshot):
+                return
+
+            # Set before the request so a failed check also waits for the next interval
+            self._checked_at = time.time()
+            try:
+                updated = self._sync(snapshot)
+            except Exception as e:
+                # Keep serving the cached list if AGOL can't be reached
+                if not snapshot.projects:
+                    raise
+                logger.warning("AASHTOWare project refresh failed, using cached list: %s", e)
+                return
+
+            if updated is not snapshot:
+                self.snapshot = updated
+                self._save(updated)
+        finally:
+            self._refresh_lock.release()
+
+
+_awp_cache = None
+_awp_cache_lock = threading.Lock()
+
+
+def get_awp_project_cache() -> AWPProjectCache:
+    """Return the process-wide AWPProjectCache, refreshed if it is due."""
+    global _awp_cache
+    with _awp_cache_lock:
+        if _awp_cache is None:
+            _awp_cache = AWPProjectCache()
+    _awp_cache.refresh()
+    return _awp_cache
+
+
+def aashtoware_project():
+    aashtoware = AWP_URL
 
-    # Sorted labels for a stable and deterministic order
-    labels = sorted(label_to_gid.keys())
+    # <label> -> <GlobalID> mapping and sorted labels come precomputed from the cache
+    snapshot = get_awp_project_cache().snapshot
+    label_to_gid = snapshot.label_to_gid
 
     # Insert a placeholder option at the top
     placeholder_label = "— Select a project —"
-    labels = [placeholder_label] + labels
+    labels = [placeholder_label] + snapshot.labels
 
     # Versioned widget key so changing source/project forces a hard reset
     version = st.session_state.get("form_version", 0)
@@ -0,0 +1,17 @@
+"""
+Streamlit-free core of the APEX Project Loader.
+
+    credentials      pluggable AGOL credentials (environment, file, st.secrets)
+    agol             AGOL REST client: token cache, queries, applyEdits
+    geometry         coordinate normalization, reprojection and simplification
+    geography_index  local spatial index of the district polygons
+    districts        district attribution for a project geometry
+    draft            ProjectDraft, the typed project model
+    payloads         applyEdits payload builders for a ProjectDraft
+    upload           atomic and parallel project uploads
+
+The Streamlit pages are thin adapters that build a ProjectDraft from
+session_state; batch jobs can construct drafts directly and use the same
+builders and client. Submodules are imported on demand so that importing the
+package stays cheap.
+"""
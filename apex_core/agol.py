@@ -0,0 +1,1339 @@
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+import logging
+
+from .credentials import default_credentials, resolve_credentials
+
+
+aashtoware = 'https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/AWP_PROJECTS_EXPORT_XYTableToPoint_ExportFeatures/FeatureServer'
+mileposts = 'https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/AKDOT_Routes_Mileposts/FeatureServer'
+
+
+def format_guid(value) -> str:
+    """
+    Ensures a GUID/GlobalID value is in the correct ArcGIS format.
+    Accepts either a string or a single-element list of strings.
+    """
+    # If it's a list, take the first element
+    if isinstance(value, list):
+        if not value:  # empty list
+            return None
+        value = value[0]
+
+    if not value or not isinstance(value, str):
+        return None
+
+    clean_value = value.strip().lstrip("{").rstrip("}")
+    parts = clean_value.split("-")
+    if len(parts) != 5 or not all(parts):
+        return None
+
+    return f"{{{clean_value}}}"
+
+
+logger = logging.getLogger("agol")
+
+
+# --- HTTP transport ---
+# Connect/read timeouts in seconds, keyed by endpoint type
+TIMEOUTS = {
+    "token": (5, 15),
+    "query": (5, 30),
+    "edit": (5, 120),
+}
+_EDIT_ENDPOINTS = ("applyEdits", "addFeatures", "updateFeatures", "deleteFeatures")
+
+# Retry policy for throttled, failed or transient requests
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5   # seconds
+BACKOFF_MAX = 20     # seconds
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Status codes that mean the server never processed the request, safe to retry for edits
+SAFE_RETRY_STATUS_CODES = {429, 503}
+# ArcGIS JSON error codes that indicate a transient server-side failure. 500 is
+# left out: in a JSON error body it usually means a bad where clause or field,
+# which would fail the same way every time (HTTP 500 responses are still retried)
+TRANSIENT_ERROR_CODES = {429, 502, 503, 504}
+
+
+def _build_session(pool_size: int = 20) -> requests.Session:
+    """
+    Build a keep-alive session with a connection pool large enough for
+    concurrent queries against the same AGOL host.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Shared by every function and class in this module (and every session in the process)
+http_session = _build_session()
+
+
+def _timeout_for(url: str) -> tuple:
+    """Return the (connect, read) timeout for an endpoint based on its URL."""
+    endpoint = url.rstrip("/").rsplit("/", 1)[-1]
+    if endpoint == "generateToken":
+        return TIMEOUTS["token"]
+    if endpoint in _EDIT_ENDPOINTS:
+        return TIMEOUTS["edit"]
+    return TIMEOUTS["query"]
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff delay for the given retry attempt."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_after(response) -> float:
+    """
+    Parse a Retry-After header (seconds or HTTP date) into a delay in seconds.
+    Returns None if the header is missing or unreadable.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), 60.0)
+
+
+def _never_sent(error: Exception) -> bool:
+    """True if a connection error happened before the request reached the server."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    # Refused connections and DNS failures surface as a MaxRetryError whose reason
+    # is a NewConnectionError (NameResolutionError subclasses it)
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.exceptions.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+def send_request(method: str, url: str, params: dict, timeout: tuple = None, idempotent: bool = True):
+    """
+    Send a request over the shared session, retrying throttled and failed calls.
+
+    Connection errors and 429/5xx responses are retried with jittered
+    exponential backoff, honouring ``Retry-After`` when the server sends it.
+    Non-idempotent requests (edits) are only retried when the server cannot
+    have processed them: connect timeouts, refused connections, DNS failures,
+    429 and 503.
+
+    Args:
+        method (str): "GET" or "POST". POST parameters are sent form-encoded.
+        url (str): The full endpoint URL.
+        params (dict): Request parameters.
+        timeout (tuple, optional): (connect, read) timeout in seconds. Defaults to
+            the value in TIMEOUTS for the endpoint type.
+        idempotent (bool, optional): Whether the request is safe to repeat. Defaults to True.
+
+    Returns:
+        requests.Response: The final response.
+
+    Raises:
+        requests.exceptions.RequestException: If the request still fails after all retries.
+    """
+    timeout = timeout or _timeout_for(url)
+    retry_codes = RETRY_STATUS_CODES if idempotent else SAFE_RETRY_STATUS_CODES
+
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            if method.upper() == "POST":
+                response = http_session.post(url, data=params, timeout=timeout)
+            else:
+                response = http_session.get(url, params=params, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            # A read timeout on an edit may have been applied server-side, so don't repeat it
+            retryable = idempotent or _never_sent(e)
+            if not retryable or attempt == MAX_RETRIES:
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+
+        if response.status_code in retry_codes and attempt < MAX_RETRIES:
+            delay = _retry_after(response)
+            time.sleep(delay if delay is not None else _backoff(attempt))
+            continue
+
+        return response
+
+
+TOKEN_URL = "https://www.arcgis.com/sharing/rest/generateToken"
+
+# ArcGIS error codes returned when a token is expired or otherwise rejected
+INVALID_TOKEN_CODES = {498, 499}
+
+
+class AGOLTokenManager:
+    """
+    Process-wide cache for the ArcGIS Online token.
+
+    A single instance is shared by every Streamlit session or batch worker in
+    the process. The token is reused until shortly before its ``expires`` time
+    and refreshed once under a lock, so concurrent callers never trigger
+    duplicate ``generateToken`` requests. Credentials are only loaded from the
+    provider when a token is generated.
+    """
+
+    def __init__(self, credentials, expiration: int = 60, refresh_margin: int = 120):
+        """
+        Args:
+            credentials: A credential provider (see ``apex_core.credentials``)
+                or a Credentials instance.
+            expiration (int, optional): Requested token lifetime in minutes. Defaults to 60.
+            refresh_margin (int, optional): Seconds before expiry at which the token
+                is considered stale and refreshed. Defaults to 120.
+        """
+        self.credentials = credentials
+        self.expiration = expiration
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, token, expires: float) -> bool:
+        return token is not None and time.time() < expires - self.refresh_margin
+
+    def get_token(self) -> str:
+        """
+        Return a cached token, generating a new one only if it is missing or about to expire.
+        """
+        # Read once: invalidate() may clear the token between a check and a second read
+        token, expires = self._token, self._expires
+        if self._is_fresh(token, expires):
+            return token
+
+        with self._lock:
+            # Another thread may have refreshed while we waited on the lock
+            if not self._is_fresh(self._token, self._expires):
+                self._token, self._expires = self._generate_token()
+            return self._token
+
+    def invalidate(self, token: str = None):
+        """
+        Drop the cached token so the next call re-authenticates.
+
+        If ``token`` is given, the cache is only cleared when it still holds that
+        token, so many threads reporting the same rejected token cause one refresh.
+        """
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires = 0.0
+
+    def set_credentials(self, credentials):
+        """Swap the credential provider and drop the cached token."""
+        with self._lock:
+            self.credentials = credentials
+            self._token = None
+            self._expires = 0.0
+
+    def _generate_token(self) -> tuple:
+        """
+        Request a new token from ArcGIS Online.
+
+        Returns:
+            tuple: The token string and its expiry as a Unix timestamp in seconds.
+
+        Raises:
+            ValueError: If authentication fails or the token is not found in the response.
+            ConnectionError: If there is a network issue preventing communication with the API.
+        """
+        credentials = resolve_credentials(self.credentials)
+
+        # Payload required for authentication request
+        data = {
+            "username": credentials.username,
+            "password": credentials.password,
+            "referer": "https://www.arcgis.com",  # Required reference for token generation
+            "expiration": self.expiration,
+            "f": "json"  # Request response format
+        }
+
+        try:
+            # Send authentication request
+            response = send_request("POST", TOKEN_URL, data)
+
+            # Validate HTTP response status
+            if response.status_code != 200:
+                raise Exception(f"Request failed with status code {response.status_code}: {response.text}")
+
+            # Parse JSON response
+            token_data = response.json()
+
+            # Extract token if authentication is successful
+            if token_data.get("token"):
+                # 'expires' is epoch milliseconds; fall back to the requested lifetime
+                expires = token_data.get("expires")
+                expires = expires / 1000 if expires else time.time() + self.expiration * 60
+                return token_data["token"], expires
+            elif "error" in token_data:
+                raise ValueError(f"Authentication failed: {token_data['error']['message']}")
+            else:
+                raise ValueError("Unexpected response format: Token not found.")
+
+        except requests.exceptions.RequestException as e:
+            # Handle network-related errors
+            raise ConnectionError(f"Failed to connect to ArcGIS Online: {e}")
+
+
+token_manager = AGOLTokenManager(default_credentials())
+
+
+def configure_credentials(credentials):
+    """
+    Use a different credential provider for every AGOL request in the process.
+
+    Args:
+        credentials: A credential provider or a Credentials instance, e.g.
+            ``FileCredentials("agol.json")`` for a batch job.
+    """
+    token_manager.set_credentials(credentials)
+
+
+def get_agol_token() -> str:
+    """
+    Returns an authentication token for ArcGIS Online.
+
+    The token is served from the shared ``token_manager`` cache and is only
+    regenerated when it is close to expiring.
+
+    Returns:
+        str: A valid authentication token used to make authorized API requests.
+
+    Raises:
+        ValueError: If authentication fails or the token is not found in the response.
+        ConnectionError: If there is a network issue preventing communication with the API.
+    """
+    return token_manager.get_token()
+
+
+def agol_request(method: str, url: str, params: dict, timeout: tuple = None, idempotent: bool = True) -> dict:
+    """
+    Send an authenticated request to an ArcGIS REST endpoint and return the JSON body.
+
+    The current token is added to the parameters and the request is sent with
+    send_request(). A GET whose final URL, token included, would exceed
+    MAX_GET_URL_LENGTH is sent as form-encoded POST instead. If ArcGIS
+    rejects the token as invalid or expired (498/499), the token is
+    invalidated and the request is retried once with a fresh one. Transient
+    ArcGIS JSON errors on idempotent requests are retried with backoff.
+
+    Args:
+        method (str): "GET" or "POST". POST parameters are sent form-encoded,
+            as are GET parameters too long for a URL.
+        url (str): The full endpoint URL (e.g. ``.../FeatureServer/0/query``).
+        params (dict): Request parameters, excluding the token.
+        timeout (tuple, optional): (connect, read) timeout in seconds.
+        idempotent (bool, optional): Whether the request is safe to repeat. Defaults to True.
+
+    Returns:
+        dict | list: The parsed JSON response.
+
+    Raises:
+        Exception: If the request fails or the API returns an error message.
+    """
+    token_retried = False
+    attempt = 0
+
+    while True:
+        token = get_agol_token()
+        payload = dict(params, token=token)
+        send_method = method
+        if method == "GET" and len(url) + 1 + len(urlencode(payload)) > MAX_GET_URL_LENGTH:
+            send_method = "POST"
+        response = send_request(send_method, url, payload, timeout=timeout, idempotent=idempotent)
+
+        if response.status_code in INVALID_TOKEN_CODES and not token_retried:
+            token_manager.invalidate(token)
+            token_retried = True
+            continue
+
+        if response.status_code != 200:
+            raise Exception(f"Request failed with status code {response.status_code}: {response.text}")
+
+        data = response.json()
+        # Service-level applyEdits returns a list of per-layer results
+        error = data.get("error") if isinstance(data, dict) else None
+        if error:
+            code = error.get("code")
+            if code in INVALID_TOKEN_CODES and not token_retried:
+                token_manager.invalidate(token)
+                token_retried = True
+                continue
+            if idempotent and code in TRANSIENT_ERROR_CODES and attempt < MAX_RETRIES:
+                time.sleep(_backoff(attempt))
+                attempt += 1
+                continue
+            raise Exception(f"API Error: {error.get('message')} - {error.get('details', [])}")
+
+        return data
+
+
+# GET URLs longer than this are sent as form-encoded POST instead. ArcGIS
+# Online rejects URLs somewhere past 2048 characters. Checked against the
+# final URL, token included, with some room left for the host's own limits.
+MAX_GET_URL_LENGTH = 1800
+
+# Decimal places kept for WGS84 coordinates in query geometries (~0.1 m)
+GEOMETRY_PRECISION = 6
+
+
+def _round_coordinates(value, precision: int):
+    """Round every number in a nested coordinate list."""
+    if isinstance(value, (list, tuple)):
+        return [_round_coordinates(item, precision) for item in value]
+    if isinstance(value, float):
+        return round(value, precision)
+    return value
+
+
+def compact_geometry(geometry: dict, precision: int = GEOMETRY_PRECISION) -> str:
+    """
+    Encode an ArcGIS JSON geometry as compactly as possible.
+
+    Coordinates are rounded to ``precision`` decimal places and the JSON is
+    written without whitespace.
+
+    Args:
+        geometry (dict): ArcGIS JSON geometry (x/y, points, paths or rings).
+        precision (int, optional): Decimal places to keep. Defaults to GEOMETRY_PRECISION.
+
+    Returns:
+        str: The encoded geometry.
+    """
+    rounded = {
+        key: _round_coordinates(value, precision) if key in ("x", "y", "points", "paths", "rings") else value
+        for key, value in geometry.items()
+    }
+    return json.dumps(rounded, separators=(",", ":"))
+
+
+# Approximate length of one degree of latitude, for converting tolerances to WGS84 units
+METERS_PER_DEGREE = 111320
+
+
+def generalization_params(max_offset_m: float, precision: int = GEOMETRY_PRECISION) -> dict:
+    """
+    Query parameters that make ArcGIS generalize returned geometries server-side.
+
+    Args:
+        max_offset_m (float): Maximum allowable offset in meters. Since results
+            are requested in WGS84 it is sent in degrees. 0 or None keeps full resolution.
+        precision (int, optional): Decimal places for returned coordinates.
+
+    Returns:
+        dict: ``maxAllowableOffset`` and ``geometryPrecision`` parameters.
+    """
+    params = {"geometryPrecision": precision}
+    if max_offset_m:
+        params["maxAllowableOffset"] = round(max_offset_m / METERS_PER_DEGREE, 9)
+    return params
+
+
+def query_request(url: str, params: dict, timeout: tuple = None) -> dict:
+    """
+    Send a read-only query with agol_request(), choosing GET or POST by size.
+
+    Short requests go out as GET. Requests whose encoded URL, token included,
+    would exceed MAX_GET_URL_LENGTH (long geometries or where clauses) are
+    sent as form-encoded POST by agol_request(), which ArcGIS accepts on
+    every query endpoint.
+
+    Args:
+        url (str): The full query endpoint URL.
+        params (dict): Query parameters, excluding the token.
+        timeout (tuple, optional): (connect, read) timeout in seconds.
+
+    Returns:
+        dict: The parsed JSON response.
+    """
+    return agol_request("GET", url, params, timeout=timeout)
+
+
+
+# --- Paginated query engine ---
+DEFAULT_PAGE_SIZE = 1000
+# Upper bound on offset pages per query, in case a server keeps reporting exceededTransferLimit
+MAX_QUERY_PAGES = 10000
+
+_layer_info_cache = {}
+_layer_info_lock = threading.Lock()
+
+
+def get_layer_info(url: str, layer) -> dict:
+    """
+    Return the layer's REST metadata (fields, maxRecordCount, query capabilities).
+
+    Metadata is cached for the life of the process since it only changes when
+    the service schema is republished.
+
+    Args:
+        url (str): The base URL of the Feature Service.
+        layer (int | str): The layer ID.
+
+    Returns:
+        dict: The layer description returned by ``{url}/{layer}?f=json``.
+    """
+    key = (url.rstrip("/"), str(layer))
+    with _layer_info_lock:
+        if key in _layer_info_cache:
+            return _layer_info_cache[key]
+
+    info = agol_request("GET", f"{key[0]}/{layer}", {"f": "json"})
+
+    with _layer_info_lock:
+        _layer_info_cache[key] = info
+    return info
+
+
+def get_last_edit_date(url: str, layer) -> int:
+    """
+    Return the layer's ``editingInfo.lastEditDate`` (epoch milliseconds).
+
+    Unlike get_layer_info() this always asks the service, so it can be used to
+    detect whether locally cached data is out of date.
+
+    Args:
+        url (str): The base URL of the Feature Service.
+        layer (int | str): The layer ID.
+
+    Returns:
+        int: The last edit time, or None if the service does not report it.
+    """
+    info = agol_request("GET", f"{url.rstrip('/')}/{layer}", {"f": "json"})
+    return info.get("editingInfo", {}).get("lastEditDate")
+
+
+def get_feature_count(url: str, layer, where: str = "1=1") -> int:
+    """
+    Return the number of records matching a where clause (``returnCountOnly``).
+
+    Args:
+        url (str): The base URL of the Feature Service.
+        layer (int | str): The layer ID.
+        where (str, optional): SQL-style filter expression. Defaults to "1=1".
+
+    Returns:
+        int: The matching record count.
+    """
+    data = query_request(
+        f"{url.rstrip('/')}/{layer}/query", {"where": where, "returnCountOnly": "true", "f": "json"}
+    )
+    return data.get("count", 0)
+
+
+def _run_pages(fetch, jobs: list, max_workers: int):
+    """
+    Yield the features of each page as it completes.
+
+    Pages are fetched one after another when ``max_workers`` is 1, otherwise in
+    a bounded thread pool, in which case features arrive in completion order.
+    """
+    if max_workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield from fetch(job).get("features", [])
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+        futures = [pool.submit(fetch, job) for job in jobs]
+        for future in as_completed(futures):
+            yield from future.result().get("features", [])
+
+
+def iter_query_features(
+    url: str,
+    layer,
+    where: str = "1=1",
+    out_fields: str = "*",
+    return_geometry: bool = False,
+    order_by: str = None,
+    extra_params: dict = None,
+    page_size: int = None,
+    max_workers: int = 1,
+):
+    """
+    Stream every feature matching a query, paging past the service's maxRecordCount.
+
+    Layers that support pagination are read with ``resultOffset``/``resultRecordCount``
+    until ``exceededTransferLimit`` is false. Otherwise the matching object IDs are
+    fetched first and queried in chunks. Features are yielded as each page arrives.
+
+    When ``max_workers`` is greater than 1 and the query is not a distinct or
+    statistics query, the total is first probed with ``returnCountOnly`` and
+    the pages are fetched concurrently. Features then
+    arrive in page completion order rather than in ``order_by`` order.
+
+    Args:
+        url (str): The base URL of the Feature Service.
+        layer (int | str): The layer ID to query.
+        where (str, optional): SQL-style filter expression. Defaults to "1=1".
+        out_fields (str, optional): Comma-separated field names. Defaults to "*".
+        return_geometry (bool, optional): Include geometry (in WGS84). Defaults to False.
+        order_by (str, optional): ``orderByFields`` value. Defaults to the object ID field,
+            which keeps page boundaries stable.
+        extra_params (dict, optional): Additional query parameters (e.g. returnDistinctValues).
+        page_size (int, optional): Records per page. Defaults to the layer's maxRecordCount.
+        max_workers (int, optional): Number of pages to fetch in parallel. Defaults to 1.
+
+    Yields:
+        dict: Feature dictionaries as returned by the query endpoint.
+    """
+    info = get_layer_info(url, layer)
+    query_url = f"{url.rstrip('/')}/{layer}/query"
+
+    max_records = info.get("maxRecordCount") or DEFAULT_PAGE_SIZE
+    page_size = min(page_size or max_records, max_records)
+    oid_field = info.get("objectIdField") or "OBJECTID"
+    capabilities = info.get("advancedQueryCapabilities", {})
+    distinct = str((extra_params or {}).get("returnDistinctValues", "false")).lower() == "true"
+    # Distinct and statistics queries return groups, not rows
+    aggregated = distinct or "outStatistics" in (extra_params or {})
+    supports_pagination = capabilities.get("supportsPagination", False) and (
+        not aggregated or capabilities.get("supportsPaginationOnAggregatedQueries", False)
+    )
+
+    params = {
+        "where": where,
+        "outFields": out_fields,
+        "returnGeometry": str(return_geometry).lower(),
+        "f": "json",
+    }
+    if return_geometry:
+        params["outSR"] = 4326
+    params.update(extra_params or {})
+
+    # Offset paging
+    if supports_pagination:
+        params["orderByFields"] = order_by or oid_field
+
+        def fetch_offset(offset):
+            return query_request(query_url, dict(params, resultOffset=offset, resultRecordCount=page_size))
+
+        # returnCountOnly counts features, not groups, so aggregated queries page serially
+        if max_workers > 1 and not aggregated:
+            count = query_request(query_url, dict(params, returnCountOnly="true")).get("count", 0)
+            yield from _run_pages(fetch_offset, list(range(0, count, page_size)), max_workers)
+            return
+
+        offset = 0
+        seen_groups = set()
+        for _ in range(MAX_QUERY_PAGES):
+            data = fetch_offset(offset)
+            features = data.get("features", [])
+            if aggregated:
+                # A server that ignores resultOffset returns the same groups again; stop there
+                new = []
+                for feature in features:
+                    key = json.dumps(feature.get("attributes", {}), sort_keys=True, default=str)
+                    if key not in seen_groups:
+                        seen_groups.add(key)
+                        new.append(feature)
+                if features and not new:
+                    return
+                yield from new
+            else:
+                yield from features
+            if not features or not data.get("exceededTransferLimit"):
+                return
+            offset += len(features)
+        logger.warning("Stopped paging %s after %d pages", query_url, MAX_QUERY_PAGES)
+        return
+
+    # Aggregated results can't be partitioned by object ID, so take what one request returns
+    if aggregated:
+        if order_by:
+            params["orderByFields"] = order_by
+        yield from query_request(query_url, params).get("features", [])
+        return
+
+    # Object ID partitioning
+    ids = query_request(
+        query_url, {"where": where, "returnIdsOnly": "true", "f": "json"}
+    ).get("objectIds") or []
+    ids.sort()
+    chunks = [ids[i:i + page_size] for i in range(0, len(ids), page_size)]
+
+    def fetch_ids(chunk):
+        return agol_request("POST", query_url, dict(params, objectIds=",".join(map(str, chunk))))
+
+    yield from _run_pages(fetch_ids, chunks, max_workers)
+
+
+
+# Name of the count column requested from outStatistics
+VALUE_COUNT_FIELD = "value_count"
+
+_NUMERIC_FIELD_TYPES = {
+    "esriFieldTypeSmallInteger", "esriFieldTypeInteger", "esriFieldTypeBigInteger",
+    "esriFieldTypeSingle", "esriFieldTypeDouble", "esriFieldTypeOID",
+}
+
+
+def _attribute(attributes: dict, name: str):
+    """Look up an attribute case-insensitively (statistics fields may come back re-cased)."""
+    if name in attributes:
+        return attributes[name]
+    lower = name.lower()
+    return next((v for k, v in attributes.items() if k.lower() == lower), None)
+
+
+def get_unique_field_values(
+    url: str,
+    layer: str,
+    field: str,
+    where: str = "1=1",
+    sort_type: str = None,   # "alpha" or "numeric"
+    sort_order: str = "asc",  # "asc" or "desc"
+    return_counts: bool = False
+):
+    """
+    Queries an ArcGIS REST API layer to retrieve all unique values from a specified field,
+    with optional sorting.
+
+    Ordering is pushed to the server with ``orderByFields`` and large result sets
+    are paged. Layers that support statistics are queried with
+    ``groupByFieldsForStatistics``/``outStatistics``, which also returns a count
+    per value. Otherwise ``returnDistinctValues`` is used and values are deduped
+    locally with a set. Null values are left out.
+
+    Args:
+        url (str): The base URL of the ArcGIS REST API service.
+        layer (str): The layer ID or name to query.
+        field (str): The field name to retrieve unique values from.
+        where (str, optional): SQL-style filter expression. Defaults to "1=1" (all records).
+        sort_type (str, optional): "alpha" for alphabetical or "numeric" for numerical sorting.
+        sort_order (str, optional): "asc" for ascending or "desc" for descending. Defaults to "asc".
+        return_counts (bool, optional): Return a {value: count} dict instead of a list.
+            Defaults to False.
+
+    Returns:
+        list | dict: The unique values from the specified field, optionally sorted, or
+            a dict of value -> record count in the same order when ``return_counts`` is set.
+
+    Raises:
+        ValueError: If authentication fails or the field does not exist.
+        Exception: If the API request fails or returns an error message.
+    """
+
+    try:
+        # Validate that requested field exists
+        info = get_layer_info(url, layer)
+        field_types = {field_info["name"]: field_info.get("type") for field_info in info.get("fields", [])}
+        if field not in field_types:
+            raise ValueError(f"Field '{field}' does not exist. Available fields: {set(field_types)}")
+
+        reverse = sort_order.lower() == "desc"
+        order_by = f"{field} {'DESC' if reverse else 'ASC'}"
+        supports_statistics = info.get("supportsStatistics") or \
+            info.get("advancedQueryCapabilities", {}).get("supportsStatistics", False)
+
+        counts = {}
+        if supports_statistics:
+            # One row per distinct value, with its count, grouped on the server
+            statistics = [{
+                "statisticType": "count",
+                "onStatisticField": field,
+                "outStatisticFieldName": VALUE_COUNT_FIELD
+            }]
+            features = iter_query_features(
+                url,
+                layer,
+                where=where,
+                out_fields=field,
+                order_by=order_by,
+                extra_params={"groupByFieldsForStatistics": field, "outStatistics": json.dumps(statistics)}
+            )
+            for feature in features:
+                attributes = feature.get("attributes", {})
+                value = _attribute(attributes, field)
+                if value is not None:
+                    counts[value] = counts.get(value, 0) + (_attribute(attributes, VALUE_COUNT_FIELD) or 0)
+
+        elif return_counts:
+            # No statistics support: count every matching row locally
+            for feature in iter_query_features(url, layer, where=where, out_fields=field, order_by=order_by):
+                value = feature.get("attributes", {}).get(field)
+                if value is not None:
+                    counts[value] = counts.get(value, 0) + 1
+
+        else:
+            # Page through the distinct values and dedupe with a set (pages may overlap)
+            features = iter_query_features(
+                url,
+                layer,
+                where=where,
+                out_fields=field,
+                order_by=order_by,
+                extra_params={"returnDistinctValues": "true"}
+            )
+            seen = set()
+            for feature in features:
+                value = feature.get("attributes", {}).get(field)
+                if value is not None and value not in seen:
+                    seen.add(value)
+                    counts[value] = None
+
+        unique_values = list(counts)
+
+        # Apply sorting if requested. The server already ordered the values, so this is a
+        # near-linear pass that only fixes collation and numeric-in-text differences.
+        if sort_type:
+            if sort_type.lower() == "alpha":
+                unique_values.sort(key=lambda x: str(x).lower(), reverse=reverse)
+            elif sort_type.lower() == "numeric" and field_types[field] not in _NUMERIC_FIELD_TYPES:
+                try:
+                    unique_values.sort(key=lambda x: float(x), reverse=reverse)
+                except ValueError:
+                    raise ValueError("Numeric sorting failed: field contains non-numeric values.")
+
+        if return_counts:
+            return {value: counts[value] for value in unique_values}
+        return unique_values
+
+    except requests.exceptions.RequestException as req_error:
+        raise Exception(f"Network error occurred: {req_error}")
+    except ValueError as val_error:
+        raise ValueError(val_error)
+    except Exception as gen_error:
+        raise Exception(gen_error)
+    
+
+
+
+
+def get_multiple_fields(url: str, layer: int = 0, fields: list = None, max_workers: int = 1,
+                        where: str = "1=1") -> list:
+    """
+    Queries an ArcGIS REST API table layer to retrieve records with specified fields.
+    All pages are read, so results are not truncated at the service's maxRecordCount.
+
+    Args:
+        url (str): The base URL of the ArcGIS REST API service.
+        layer (int): The layer ID to query. Defaults to 0.
+        fields (list): A list of field names to request from the service.
+        max_workers (int): Number of pages to fetch in parallel. Defaults to 1.
+        where (str, optional): SQL-style filter expression. Defaults to "1=1" (all records).
+
+    Returns:
+        list: A list of dictionaries with keys based on the feature attributes returned.
+    """
+    try:
+        # If no fields provided, request all
+        out_fields = ",".join(fields) if fields else "*"
+
+        features = iter_query_features(url, layer, where=where, out_fields=out_fields, max_workers=max_workers)
+
+        results = []
+        for feature in features:
+            attributes = feature.get("attributes", {})
+            # Directly use the returned attribute names as dictionary keys
+            results.append({k: v for k, v in attributes.items()})
+
+        return results
+
+    except Exception as e:
+        raise Exception(f"Error retrieving project records: {e}")
+
+
+
+
+def select_record(url: str, layer: int, id_field: str, id_value: str, fields = "*", return_geometry = False):
+    """
+    Queries an ArcGIS REST API table layer to retrieve a single record by ID field.
+
+    Args:
+        url (str): The base URL of the ArcGIS REST API service.
+        layer (int): The layer ID to query.
+        id_field (str): The name of the field to filter by (e.g., 'GlobalID', 'ProposalId').
+        id_value (str): The value to match in the ID field.
+
+    Returns:
+        list: A list of matching feature dictionaries.
+    """
+    try:
+        params = {
+            "where": f"{id_field}={sql_literal(id_value)}",
+            "outFields": fields,
+            "returnGeometry": str(return_geometry).lower(),
+            "outSR": 4326,
+            "f": "json"
+        }
+
+        query_url = f"{url}/{layer}/query"
+        data = query_request(query_url, params)
+
+        return data.get("features", [])
+
+    except Exception as e:
+        raise Exception(f"Error retrieving project record: {e}")
+    
+
+
+# Keep batched IN (...) clauses well under the service's request size limits
+MAX_WHERE_LENGTH = 4000
+MAX_IDS_PER_REQUEST = 250
+
+
+def sql_literal(value) -> str:
+    """Quote a value for use in an ArcGIS SQL where clause."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def build_in_clauses(field: str, values: list, max_length: int = MAX_WHERE_LENGTH,
+                     max_values: int = MAX_IDS_PER_REQUEST) -> list:
+    """
+    Build ``field IN (...)`` where clauses covering all values, split so each
+    clause stays under ``max_length`` characters and ``max_values`` values.
+
+    Args:
+        field (str): The field to filter on.
+        values (list): The values to match. Duplicates are removed, order is kept.
+        max_length (int, optional): Maximum characters per clause.
+        max_values (int, optional): Maximum values per clause.
+
+    Returns:
+        list: A list of where clause strings (empty if no values were given).
+    """
+    prefix = f"{field} IN ("
+    clauses = []
+    chunk = []
+    length = len(prefix) + 1
+
+    for value in dict.fromkeys(str(v) for v in values if v is not None):
+        literal = sql_literal(value)
+        if chunk and (length + len(literal) + 1 > max_length or len(chunk) >= max_values):
+            clauses.append(prefix + ",".join(chunk) + ")")
+            chunk = []
+            length = len(prefix) + 1
+        chunk.append(literal)
+        length += len(literal) + 1
+
+    if chunk:
+        clauses.append(prefix + ",".join(chunk) + ")")
+    return clauses
+
+
+def select_records(url: str, layer: int, id_field: str, id_values: list, fields="*",
+                   return_geometry=False, max_workers: int = 1, extra_params: dict = None) -> dict:
+    """
+    Queries an ArcGIS REST API layer for many records by ID in as few requests as possible.
+
+    The IDs are combined into chunked ``IN (...)`` where clauses sent by POST, so a
+    list of IDs normally costs a single request instead of one per ID.
+
+    Args:
+        url (str): The base URL of the ArcGIS REST API service.
+        layer (int): The layer ID to query.
+        id_field (str): The name of the field to filter by (e.g., 'GlobalID', 'Route_ID').
+        id_values (list): The values to match in the ID field.
+        fields (str, optional): Comma-separated fields to return. Defaults to "*".
+        return_geometry (bool, optional): Include geometry (in WGS84). Defaults to False.
+        max_workers (int, optional): Number of chunks to fetch in parallel. Defaults to 1.
+        extra_params (dict, optional): Additional query parameters (e.g. generalization_params()).
+
+    Returns:
+        dict: Feature dictionaries keyed by the string value of ``id_field``.
+            IDs with no matching record are absent. If several records share an
+            ID, the first one returned is kept.
+    """
+    try:
+        clauses = build_in_clauses(id_field, id_values)
+        if not clauses:
+            return {}
+
+        # The ID field is needed to key the results
+        if fields != "*" and id_field.lower() not in {f.strip().lower() for f in fields.split(",")}:
+            fields = f"{fields},{id_field}"
+
+        params = {
+            "outFields": fields,
+            "returnGeometry": str(return_geometry).lower(),
+            "outSR": 4326,
+            "f": "json"
+        }
+        params.update(extra_params or {})
+        query_url = f"{url}/{layer}/query"
+
+        def fetch(where):
+            return agol_request("POST", query_url, dict(params, where=where))
+
+        records = {}
+        for feature in _run_pages(fetch, clauses, max_workers):
+            attributes = feature.get("attributes", {})
+            # Match the ID field case-insensitively, since AGOL may return e.g. GlobalID vs GlobalId
+            key = next((v for k, v in attributes.items() if k.lower() == id_field.lower()), None)
+            if key is not None:
+                records.setdefault(str(key), feature)
+
+        return records
+
+    except Exception as e:
+        raise Exception(f"Error retrieving project records: {e}")
+
+
+
+def delete_project(url: str, layer: int, globalid: str) -> bool:
+    """
+    Delete a project from an ArcGIS Feature Service using its GlobalID.
+
+    This function calls the ArcGIS REST API `deleteFeatures` endpoint to remove
+    a feature from the specified layer. It uses a `where` clause to match the
+    provided GlobalID.
+
+    Args:
+        url (str): Base URL of the Feature Service (ending with /FeatureServer).
+        layer (int): Layer index within the Feature Service where the project resides.
+        globalid (str): The GlobalID of the project to delete.
+
+    Returns:
+        bool: True if the project was successfully deleted, False otherwise.
+
+    """
+
+    try:
+        # Parameters for the deleteFeatures request
+        params = {
+            "where": f"GlobalID={sql_literal(globalid)}",  # Filter by GlobalID
+            "f": "json"                         # Response format
+        }
+
+        # Construct deleteFeatures endpoint URL
+        delete_url = f"{url}/{layer}/deleteFeatures"
+
+        # Send POST request to ArcGIS REST API
+        result = agol_request("POST", delete_url, params)
+
+        # Check response for deleteResults
+        if "deleteResults" in result:
+            return all(r.get("success", False) for r in result["deleteResults"])
+        logger.error("Unexpected deleteFeatures response: %s", result)
+        return False
+
+    except Exception as e:
+        # Catch any errors (network, JSON parsing, etc.)
+        logger.error("Error deleting project %s: %s", globalid, e)
+        return False
+
+
+
+
+
+
+class AGOLQueryIntersect:
+    def __init__(self, url, layer, geometry, fields="*", return_geometry=False,
+                 list_values=None, string_values=None, extra_params=None):
+        self.url = url
+        self.layer = layer
+        self.geometry = self._swap_coords(geometry)  # swap coords if needed
+        self.fields = fields
+        self.return_geometry = return_geometry
+        self.list_values_field = list_values
+        self.string_values_field = string_values
+        # e.g. generalization_params() to get generalized geometry back
+        self.extra_params = extra_params or {}
+
+        # Run query immediately on initialization
+        self.results = self._execute_query()
+
+        # If list_values is provided, store unique values in a list
+        self.list_values = []
+        if self.list_values_field:
+            self.list_values = self._extract_unique_values(self.list_values_field)
+
+        # If string_values is provided, store unique values in a comma-separated string
+        self.string_values = ""
+        if self.string_values_field:
+            unique_list = self._extract_unique_values(self.string_values_field)
+            self.string_values = ",".join(map(str, unique_list))
+
+    def _swap_coords(self, geometry):
+        """Swap coordinates from [lat, lon] to [lon, lat] if needed."""
+        if isinstance(geometry, list):
+            # Point
+            if len(geometry) == 2 and all(isinstance(coord, (int, float)) for coord in geometry):
+                return [geometry[1], geometry[0]]  # swap
+            # Line
+            elif all(isinstance(coord, list) and len(coord) == 2 for coord in geometry):
+                return [[pt[1], pt[0]] for pt in geometry]  # swap each pair
+        return geometry
+
+    def _build_geometry(self):
+        # ArcGIS JSON geometry (point, multipoint or multipart polyline), passed through as is
+        if isinstance(self.geometry, dict):
+            for key, geometry_type_str in (("x", "esriGeometryPoint"), ("points", "esriGeometryMultipoint"),
+                                           ("paths", "esriGeometryPolyline")):
+                if key in self.geometry:
+                    return self.geometry, geometry_type_str
+            raise ValueError("Invalid geometry format.")
+
+        if isinstance(self.geometry, list):
+            # Point
+            if len(self.geometry) == 2 and all(isinstance(coord, (int, float)) for coord in self.geometry):
+                geometry_dict = {
+                    "x": self.geometry[0],
+                    "y": self.geometry[1],
+                    "spatialReference": {"wkid": 4326}
+                }
+                geometry_type_str = "esriGeometryPoint"
+
+            # Line
+            elif all(
+                isinstance(coord, list) and len(coord) == 2 and
+                all(isinstance(val, (int, float)) for val in coord)
+                for coord in self.geometry
+            ):
+                if len(self.geometry) >= 2:
+                    geometry_dict = {
+                        "paths": [self.geometry],
+                        "spatialReference": {"wkid": 4326}
+                    }
+                    geometry_type_str = "esriGeometryPolyline"
+                else:
+                    raise ValueError("Invalid geometry: A line must have at least two coordinate pairs.")
+            else:
+                raise ValueError("Invalid geometry format.")
+        else:
+            raise ValueError("Invalid geometry: Geometry must be a list.")
+
+        return geometry_dict, geometry_type_str
+
+    def _execute_query(self):
+        geometry_dict, geometry_type_str = self._build_geometry()
+
+        params = {
+            "geometry": compact_geometry(geometry_dict),
+            "geometryType": geometry_type_str,
+            "inSR": 4326,
+            "spatialRel": "esriSpatialRelIntersects",
+            "where": "1=1",
+            "outFields": self.fields,
+            "returnGeometry": self.return_geometry,
+            "outSR": 4326,
+            "f": "json"
+        }
+        params.update(self.extra_params)
+
+        query_url = f"{self.url}/{self.layer}/query"
+        data = query_request(query_url, params)
+
+        results = []
+        requested_fields = [f.strip() for f in self.fields.split(",") if f.strip()]
+        for feature in data.get("features", []):
+            attributes = feature.get("attributes", {})
+            filtered_attrs = {f: attributes.get(f) for f in requested_fields} if self.fields != "*" else attributes
+            feature_package = {"attributes": filtered_attrs}
+            if self.return_geometry:
+                feature_package["geometry"] = feature.get("geometry", {})
+            results.append(feature_package)
+
+        return results
+
+    def _extract_unique_values(self, field_name):
+        """Return a unique list of values for the specified field. Blank if no results."""
+        if not self.results:
+            return []  # no features returned
+        available_fields = {f for feature in self.results for f in feature["attributes"].keys()}
+        if field_name not in available_fields:
+            return []  # gracefully return blank list if field not found
+        values = [feature["attributes"].get(field_name) for feature in self.results if feature["attributes"].get(field_name) is not None]
+        return list(set(values))
+    
+
+
+
+class AGOLDataLoader:
+    def __init__(self, url: str, layer: int):
+        """
+        Initialize the loader with AGOL service URL and layer ID.
+        Requests are authenticated with the shared token from token_manager.
+        """
+        self.url = url.rstrip("/")
+        self.layer = layer
+        self.success = False
+        self.message = None
+        self.globalids = []
+        
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger("AGOLDataLoader")
+
+    def add_features(self, payload: dict):
+        """
+        Add features to the AGOL feature layer using applyEdits.
+        Logs stages and sets success/message/globalids.
+        Rolls back if unsuccessful.
+        """
+        endpoint = f"{self.url}/{self.layer}/applyEdits"
+        self.logger.info("Starting add_features process...")
+
+        try:
+            # Use data= and json.dumps for adds
+            result = agol_request(
+                "POST",
+                endpoint,
+                {
+                    "f": "json",
+                    "adds": json.dumps(payload["adds"])
+                },
+                idempotent=False
+            )
+            self.logger.info("Raw response: %s", result)
+
+            if "addResults" in result:
+                add_results = result["addResults"]
+                failures = [r for r in add_results if not r.get("success")]
+
+                if failures:
+                    self.success = False
+                    error_messages = []
+                    for r in failures:
+                        err = r.get("error")
+                        if err:
+                            error_messages.append(
+                                f"Code {err.get('code')}: {err.get('description')}"
+                            )
+                    self.message = (
+                        f"Failed to add {len(failures)} feature(s). "
+                        f"Errors: {', '.join(error_messages)}"
+                    )
+                    self.logger.error(self.message)
+                else:
+                    self.success = True
+                    self.message = "All features added successfully."
+                    self.globalids = [
+                        r.get("globalId") for r in add_results if r.get("success")
+                    ]
+                    self.logger.info(self.message)
+            else:
+                self.success = False
+                self.message = f"Unexpected response: {result}"
+                self.logger.error(self.message)
+
+        except Exception as e:
+            self.success = False
+            self.message = f"Error during add_features: {str(e)}"
+            self.logger.exception(self.message)
+
+        return {
+            "success": self.success,
+            "message": self.message,
+            "globalids": self.globalids
+        }
+
+
+
+class AGOLServiceEditor:
+    def __init__(self, url: str):
+        """
+        Initialize the editor with an AGOL Feature Service URL (ending with /FeatureServer).
+        Edits are sent to the service-level applyEdits endpoint so several layers
+        can be changed in one transaction.
+        """
+        self.url = url.rstrip("/")
+        self.success = False
+        self.message = None
+        self.results = {}
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger("AGOLServiceEditor")
+
+    def add_features(self, layer_payloads: dict, use_global_ids: bool = True, rollback_on_failure: bool = True):
+        """
+        Add features to several layers in a single applyEdits call.
+
+        With ``use_global_ids`` the adds must carry client-generated GlobalIDs,
+        which lets child features reference their parent in the same request.
+        With ``rollback_on_failure`` nothing is kept unless every add succeeds.
+
+        Args:
+            layer_payloads (dict): Layer ID -> payload with an "adds" list. Empty
+                payloads are skipped.
+            use_global_ids (bool, optional): Send useGlobalIds=true. Defaults to True.
+            rollback_on_failure (bool, optional): Send rollbackOnFailure=true. Defaults to True.
+
+        Returns:
+            dict: "success", "message" and "results", where "results" maps each
+                layer ID to its own success/message/globalids.
+        """
+        endpoint = f"{self.url}/applyEdits"
+        self.logger.info("Starting service applyEdits process...")
+
+        edits = [
+            {"id": layer, "adds": payload["adds"]}
+            for layer, payload in layer_payloads.items()
+            if payload and payload.get("adds")
+        ]
+
+        try:
+            result = agol_request(
+                "POST",
+                endpoint,
+                {
+                    "f": "json",
+                    "edits": json.dumps(edits),
+                    "useGlobalIds": str(use_global_ids).lower(),
+                    "rollbackOnFailure": str(rollback_on_failure).lower()
+                },
+                idempotent=False
+            )
+            self.logger.info("Raw response: %s", result)
+
+            if not isinstance(result, list):
+                raise ValueError(f"Unexpected response: {result}")
+
+            for layer_result in result:
+                add_results = layer_result.get("addResults", [])
+                failures = [r for r in add_results if not r.get("success")]
+                error_messages = [
+                    f"Code {r['error'].get('code')}: {r['error'].get('description')}"
+                    for r in failures if r.get("error")
+                ]
+                self.results[layer_result.get("id")] = {
+                    "success": not failures,
+                    "message": (
+                        f"Failed to add {len(failures)} feature(s). Errors: {', '.join(error_messages)}"
+                        if failures else "All features added successfully."
+                    ),
+                    "globalids": [r.get("globalId") for r in add_results if r.get("success")]
+                }
+
+            failed_layers = [layer for layer, r in self.results.items() if not r["success"]]
+            missing_layers = [e["id"] for e in edits if e["id"] not in self.results]
+            self.success = not failed_layers and not missing_layers
+            if self.success:
+                self.message = "All features added successfully."
+                self.logger.info(self.message)
+            else:
+                self.message = (
+                    f"Edits failed for layer(s) {', '.join(map(str, failed_layers + missing_layers))}. "
+                    + " ".join(self.results[layer]["message"] for layer in failed_layers)
+                )
+                self.logger.error(self.message)
+
+        except Exception as e:
+            self.success = False
+            self.message = f"Error during applyEdits: {str(e)}"
+            self.logger.exception(self.message)
+
+        return {
+            "success": self.success,
+            "message": self.message,
+            "results": self.results
+        }
@@ -0,0 +1,155 @@
+"""
+Pluggable ArcGIS Online credentials.
+
+A credential provider is any object with a ``load()`` method that returns
+``Credentials`` or None when it has nothing to offer. Nothing is read until
+the first token is requested, so importing the AGOL client never touches
+the environment, the file system or Streamlit.
+
+The default chain tries, in order:
+
+1. ``AGOL_USERNAME`` / ``AGOL_PASSWORD`` environment variables
+2. A TOML or JSON file with the same keys (``APEX_CREDENTIALS_FILE``,
+   defaulting to the app's ``.streamlit/secrets.toml``)
+3. ``st.secrets``, when Streamlit is installed and running the app
+"""
+
+import os
+import json
+import logging
+from dataclasses import dataclass
+
+
+USERNAME_KEY = "AGOL_USERNAME"
+PASSWORD_KEY = "AGOL_PASSWORD"
+CREDENTIALS_FILE = os.environ.get("APEX_CREDENTIALS_FILE", os.path.join(".streamlit", "secrets.toml"))
+
+logger = logging.getLogger("credentials")
+
+
+@dataclass(frozen=True)
+class Credentials:
+    """An ArcGIS Online username and password."""
+
+    username: str
+    password: str
+
+    def __repr__(self) -> str:
+        return f"Credentials(username={self.username!r}, password='***')"
+
+
+def _from_mapping(values) -> Credentials:
+    """Build Credentials from a mapping with AGOL_USERNAME and AGOL_PASSWORD, or return None."""
+    username = values.get(USERNAME_KEY)
+    password = values.get(PASSWORD_KEY)
+    if not username or not password:
+        return None
+    return Credentials(str(username), str(password))
+
+
+class StaticCredentials:
+    """Credentials passed in directly, e.g. from a CLI prompt or a test harness."""
+
+    def __init__(self, username: str, password: str):
+        self.credentials = Credentials(username, password)
+
+    def load(self) -> Credentials:
+        return self.credentials
+
+
+class EnvCredentials:
+    """
+    Read credentials from environment variables.
+
+    Args:
+        username_var (str, optional): Variable holding the username. Defaults to AGOL_USERNAME.
+        password_var (str, optional): Variable holding the password. Defaults to AGOL_PASSWORD.
+    """
+
+    def __init__(self, username_var: str = USERNAME_KEY, password_var: str = PASSWORD_KEY):
+        self.username_var = username_var
+        self.password_var = password_var
+
+    def load(self) -> Credentials:
+        return _from_mapping({
+            USERNAME_KEY: os.environ.get(self.username_var),
+            PASSWORD_KEY: os.environ.get(self.password_var),
+        })
+
+
+class FileCredentials:
+    """
+    Read credentials from a TOML file (the Streamlit secrets format) or a JSON file.
+
+    Args:
+        path (str, optional): Path to the file. ``.json`` files are parsed as
+            JSON, anything else as TOML. Defaults to CREDENTIALS_FILE.
+    """
+
+    def __init__(self, path: str = CREDENTIALS_FILE):
+        self.path = path
+
+    def load(self) -> Credentials:
+        if not self.path or not os.path.isfile(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            if self.path.lower().endswith(".json"):
+                values = json.load(f)
+            else:
+                import tomllib
+                values = tomllib.load(f)
+        return _from_mapping(values)
+
+
+class StreamlitSecretsCredentials:
+    """Read credentials from ``st.secrets``. Returns None outside a Streamlit app."""
+
+    def load(self) -> Credentials:
+        try:
+            import streamlit as st
+            return _from_mapping({key: st.secrets[key] for key in (USERNAME_KEY, PASSWORD_KEY)})
+        except Exception as e:
+            # ImportError, missing secrets file or missing keys
+            logger.debug("No AGOL credentials in st.secrets: %s", e)
+            return None
+
+
+class ChainCredentials:
+    """Return the credentials from the first provider that has them."""
+
+    def __init__(self, *providers):
+        self.providers = providers
+
+    def load(self) -> Credentials:
+        for provider in self.providers:
+            credentials = provider.load()
+            if credentials is not None:
+                return credentials
+        return None
+
+
+def default_credentials() -> ChainCredentials:
+    """The environment, then the credentials file, then st.secrets."""
+    return ChainCredentials(EnvCredentials(), FileCredentials(), StreamlitSecretsCredentials())
+
+
+def resolve_credentials(provider) -> Credentials:
+    """
+    Load credentials from a provider.
+
+    Args:
+        provider: A provider with a ``load()`` method, or a Credentials instance.
+
+    Returns:
+        Credentials: The resolved username and password.
+
+    Raises:
+        ValueError: If the provider has no credentials.
+    """
+    credentials = provider if isinstance(provider, Credentials) else provider.load()
+    if credentials is None:
+        raise ValueError(
+            f"No AGOL credentials found. Set {USERNAME_KEY} and {PASSWORD_KEY} in the environment, "
+            f"in {CREDENTIALS_FILE} or in the Streamlit secrets."
+        )
+    return credentials
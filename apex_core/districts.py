@@ -0,0 +1,225 @@
+"""
+District attribution: which House and Senate districts, boroughs, DOT&PF
+regions and routes a project's geometry intersects.
+
+Polygon geographies are answered from the local geography index when it is
+fresh; everything else is sent to AGOL as concurrent intersect queries.
+Build the index snapshot ahead of time with:
+
+    python -m apex_core.districts sync-index
+"""
+
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .agol import AGOLQueryIntersect, get_agol_token, generalization_params
+from .draft import ProjectDraft
+from .geography_index import SNAPSHOT_PATH, build_snapshot, get_geography_index
+from .geometry import points_shape, route_shape, simplify_route, to_esri_geometry
+
+
+# Intersect query settings for each geography, keyed by session_state prefix
+DISTRICT_QUERIES = {
+    "house": {
+        "url": "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/STIP_HouseDistricts/FeatureServer",
+        "layer": 0,
+        "fields": "GlobalID,DISTRICT",
+        "list_values": "GlobalID",
+        "string_values": "DISTRICT"
+    },
+    "senate": {
+        "url": "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/STIP_SenateDistricts/FeatureServer",
+        "layer": 0,
+        "fields": "GlobalID,DISTRICT",
+        "list_values": "GlobalID",
+        "string_values": "DISTRICT"
+    },
+    "borough": {
+        "url": "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/STIP_BoroughCensus/FeatureServer",
+        "layer": 0,
+        "fields": "GlobalID,NameAlt",
+        "list_values": "GlobalID",
+        "string_values": "NameAlt"
+    },
+    "region": {
+        "url": "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/STIP_DOT_PF_Regions/FeatureServer",
+        "layer": 0,
+        "fields": "GlobalID,NameAlt",
+        "list_values": "GlobalID",
+        "string_values": "NameAlt"
+    },
+    "route": {
+        "url": "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/AKDOT_Routes_Mileposts/FeatureServer",
+        "layer": 0,
+        "fields": "Route_ID,Route_Name_Unique",
+        "list_values": "Route_ID",
+        "string_values": "Route_Name_Unique"
+    }
+}
+
+
+# Attributes and server-side generalization for each geography copied into APEX.
+# max_offset_m is the maximum distance, in meters, that a generalized boundary
+# may deviate from the source polygon or line.
+GEOGRAPHY_FETCH = {
+    "region": {"fields": "GlobalID,NameAlt", "max_offset_m": 250},
+    "borough": {"fields": "GlobalID,NameAlt,FIPS", "max_offset_m": 100},
+    "senate": {"fields": "GlobalID,DISTRICT", "max_offset_m": 50},
+    "house": {"fields": "GlobalID,DISTRICT,HOUSE_NAME,SENATE_DISTRICT", "max_offset_m": 50},
+    "route": {"fields": "Route_ID,Route_Name", "max_offset_m": 5},
+}
+
+
+# Polygon layers that can be answered from the local geography index
+INDEXED_GEOGRAPHIES = ["house", "senate", "borough", "region"]
+
+logger = logging.getLogger("districts")
+
+
+def query_fields(name: str) -> str:
+    """The intersect result fields plus the attributes geography_payload needs."""
+    fields = DISTRICT_QUERIES[name]["fields"].split(",") + GEOGRAPHY_FETCH[name]["fields"].split(",")
+    return ",".join(dict.fromkeys(field.strip() for field in fields))
+
+
+def index_configs() -> dict:
+    """The layer configs the local geography index is built from, keyed by geography name."""
+    return {name: dict(DISTRICT_QUERIES[name], fields=query_fields(name)) for name in INDEXED_GEOGRAPHIES}
+
+
+def sync_geography_index():
+    """Download the polygon geographies and write the local index snapshot. Blocks until done."""
+    return build_snapshot(index_configs())
+
+
+def query_shape(selected_point=None, selected_route=None):
+    """
+    Return the lon/lat shapely geometry to intersect for a project, or None.
+
+    Routes are queried with their simplified copy to keep requests small.
+    """
+    if selected_point:
+        return points_shape(selected_point)
+    if selected_route:
+        return route_shape(simplify_route(selected_route).route)
+    return None
+
+
+def intersect_remote(name: str, geometry):
+    """Run the AGOL intersect query for one geography. Safe to call from a worker thread."""
+    config = DISTRICT_QUERIES[name]
+    return AGOLQueryIntersect(
+        url=config["url"],
+        layer=config["layer"],
+        geometry=geometry,
+        fields=query_fields(name),
+        return_geometry=True,
+        list_values=config["list_values"],
+        string_values=config["string_values"],
+        extra_params=generalization_params(GEOGRAPHY_FETCH[name]["max_offset_m"])
+    )
+
+
+def features_by_id(name: str, result) -> dict:
+    """Key the features of an intersect result by the geography's list_values ID."""
+    id_field = DISTRICT_QUERIES[name]["list_values"]
+    return {
+        str(feature["attributes"][id_field]): feature
+        for feature in result.results
+        if feature.get("attributes", {}).get(id_field) is not None
+    }
+
+
+def attribute_geometry(shape, include_route: bool = False, use_local_index: bool = True,
+                       max_workers: int = 5, on_result=None) -> dict:
+    """
+    Intersect a project geometry with every geography layer.
+
+    Args:
+        shape: The lon/lat shapely geometry (see query_shape()).
+        include_route (bool, optional): Also intersect the route layer. Defaults to False.
+        use_local_index (bool, optional): Answer the polygon geographies from the
+            local geography index when it is fresh. Defaults to True.
+        max_workers (int, optional): Maximum concurrent AGOL queries. Defaults to 5.
+        on_result (callable, optional): Called as ``on_result(name, result, done, total)``
+            on the calling thread as each geography finishes.
+
+    Returns:
+        dict: Geography name -> IntersectResult (or AGOLQueryIntersect), each with
+            list_values, string_values and results (features with generalized geometry).
+    """
+    names = list(INDEXED_GEOGRAPHIES) + (["route"] if include_route else [])
+    results = {}
+
+    def store(name, result):
+        results[name] = result
+        if on_result is not None:
+            on_result(name, result, len(results), len(names))
+
+    index = None
+    if use_local_index:
+        index = get_geography_index(index_configs())
+    if index is not None:
+        for name in INDEXED_GEOGRAPHIES:
+            config = DISTRICT_QUERIES[name]
+            store(name, index.intersect(
+                name, shape, config["list_values"], config["string_values"],
+                return_geometry=True, max_offset_m=GEOGRAPHY_FETCH[name]["max_offset_m"]
+            ))
+
+    remote = [name for name in names if name not in results]
+    if not remote:
+        return results
+
+    # Authenticate once up front so the workers share the cached token
+    get_agol_token()
+    geometry = to_esri_geometry(shape)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(remote)))) as pool:
+        futures = {pool.submit(intersect_remote, name, geometry): name for name in remote}
+        for future in as_completed(futures):
+            store(futures[future], future.result())
+
+    return results
+
+
+def attribute_draft(draft: ProjectDraft, use_local_index: bool = True, max_workers: int = 5) -> ProjectDraft:
+    """
+    Fill in a draft's geography IDs, names and features from its geometry.
+
+    The draft is updated the same way the app's step 4 updates session_state:
+    ``<name>_list`` and ``<name>_string`` for each polygon geography and
+    route_list/route_ids/route_names for routes.
+
+    Returns:
+        ProjectDraft: The same draft, for chaining.
+    """
+    shape = query_shape(draft.selected_point, draft.selected_route)
+    if shape is None:
+        return draft
+
+    results = attribute_geometry(
+        shape, include_route=bool(draft.selected_route), use_local_index=use_local_index, max_workers=max_workers
+    )
+    draft.geography_features = {}
+    for name, result in results.items():
+        draft.geography_features[name] = features_by_id(name, result)
+        if name == "route":
+            draft.route_list = result.list_values
+            draft.route_ids = ",".join(result.list_values) or ""
+            draft.route_names = result.string_values or ""
+        else:
+            setattr(draft, f"{name}_list", result.list_values or [])
+            setattr(draft, f"{name}_string", result.string_values or "")
+    return draft
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="District attribution tools.")
+    parser.add_argument("command", choices=["sync-index"], help="sync-index: download the polygon geographies into the local index snapshot")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sync_geography_index()
+    logger.info("Geography index snapshot written to %s", SNAPSHOT_PATH)
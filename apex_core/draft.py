@@ -0,0 +1,119 @@
+"""
+Typed model of a project on its way into APEX.
+
+A ProjectDraft holds everything the payload builders need: the project
+attributes, the site points or route, the impacted communities and contacts,
+and the geography IDs and names found by the district queries. Field names
+match the app's session_state keys, so the Streamlit pages build a draft with
+``ProjectDraft.from_session_state(st.session_state)`` while batch jobs
+construct one directly.
+"""
+
+import datetime
+from dataclasses import dataclass, field, fields
+from typing import Optional
+
+from .geometry import geometry_hash
+
+
+GEOGRAPHY_NAMES = ("region", "borough", "senate", "house", "route")
+
+
+@dataclass
+class ProjectDraft:
+    """
+    A project and its child records, independent of where they were entered.
+
+    ``selected_point`` is one [lat, lon] pair or a list of them and
+    ``selected_route`` one path of [lat, lon] pairs or a list of paths; exactly
+    one of them should be set. ``<geography>_list`` holds the IDs of the
+    intersecting features (None when the geography was never queried) and
+    ``geography_features`` the matching features, keyed by geography name and
+    then ID, for the geography payloads to reuse.
+    """
+
+    # Project attributes
+    awp_proj_name: Optional[str] = None
+    proj_name: Optional[str] = None
+    iris: Optional[str] = None
+    stip: Optional[str] = None
+    fed_proj_num: Optional[str] = None
+    awp_proj_desc: Optional[str] = None
+    proj_desc: Optional[str] = None
+    proj_purp: Optional[str] = None
+    proj_impact: Optional[str] = None
+    proj_prac: Optional[str] = None
+    phase: Optional[str] = None
+    fund_type: Optional[str] = None
+    tenadd: Optional[datetime.date] = None
+    award_date: Optional[datetime.date] = None
+    award_fiscal_year: Optional[int] = None
+    contractor: Optional[str] = None
+    awarded_amount: Optional[float] = None
+    current_contract_amount: Optional[float] = None
+    amount_paid_to_date: Optional[float] = None
+    anticipated_start: Optional[str] = None
+    anticipated_end: Optional[str] = None
+    construction_year: Optional[int] = None
+    new_continuing: Optional[str] = None
+    proj_web: Optional[str] = None
+    apex_mapper_link: Optional[str] = None
+    submitted_by: Optional[str] = None
+    database_status_notes: Optional[str] = None
+    awp_globalid: Optional[str] = None
+
+    # Geometry
+    selected_point: Optional[list] = None
+    selected_route: Optional[list] = None
+
+    # Child records
+    impact_comm_ids: Optional[list] = None
+    impact_comm_names: Optional[str] = None
+    contacts: Optional[list] = None
+
+    # District attribution
+    route_ids: Optional[str] = None
+    route_names: Optional[str] = None
+    region_string: Optional[str] = None
+    borough_string: Optional[str] = None
+    senate_string: Optional[str] = None
+    house_string: Optional[str] = None
+    region_list: Optional[list] = None
+    borough_list: Optional[list] = None
+    senate_list: Optional[list] = None
+    house_list: Optional[list] = None
+    route_list: Optional[list] = None
+    geography_features: dict = field(default_factory=dict)
+
+    @property
+    def is_site(self) -> bool:
+        return bool(self.selected_point)
+
+    @property
+    def is_route(self) -> bool:
+        return not self.selected_point and bool(self.selected_route)
+
+    @property
+    def geometry(self):
+        """The site points or route, whichever the project has."""
+        return self.selected_point or self.selected_route
+
+    def geography_ids(self, name: str) -> Optional[list]:
+        """The intersecting feature IDs for a geography, or None if it was never queried."""
+        return getattr(self, f"{name}_list")
+
+    @classmethod
+    def from_session_state(cls, state) -> "ProjectDraft":
+        """
+        Build a draft from the app's session_state (or any mapping with the same keys).
+
+        The intersect features in state['geography_features'] are only carried
+        over while they were found for the current project geometry.
+        """
+        values = {f.name: state.get(f.name) for f in fields(cls) if f.name != "geography_features"}
+        draft = cls(**values)
+
+        store = state.get("geography_features")
+        if store and store.get("geometry_hash") == geometry_hash(draft.geometry):
+            draft.geography_features = dict(store.get("layers", {}))
+        return draft
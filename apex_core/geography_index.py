@@ -0,0 +1,369 @@
+"""
+Local spatial index of the district, region and borough polygons.
+
+The geography layers change very rarely, so their polygons are downloaded once,
+saved as a snapshot on disk and loaded into shapely STRtrees. Points and routes
+are then intersected in memory instead of sending every geometry to AGOL.
+The snapshot is treated as stale once it is too old or the source layer
+has been edited since it was built, and callers fall back to remote queries.
+
+Request paths only ever load the snapshot from disk. It is built offline with
+
+    python -m apex_core.districts sync-index
+
+or, when it is missing or stale, by a single background thread, with a
+backoff after a failed build.
+"""
+
+import os
+import time
+import pickle
+import logging
+import threading
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry import Polygon, MultiPolygon
+from shapely.geometry.polygon import orient
+
+from .agol import iter_query_features, get_last_edit_date, METERS_PER_DEGREE, GEOMETRY_PRECISION
+
+
+SNAPSHOT_PATH = os.environ.get(
+    "APEX_GEOGRAPHY_SNAPSHOT", os.path.join(".cache", "geography_snapshot.pkl")
+)
+SNAPSHOT_MAX_AGE = 30 * 24 * 3600   # seconds
+EDIT_CHECK_INTERVAL = 3600          # seconds between lastEditDate checks
+BUILD_RETRY_INTERVAL = 600          # seconds to wait after a failed background build
+
+logger = logging.getLogger("geography_index")
+
+
+def rings_to_polygon(rings: list):
+    """
+    Convert Esri polygon rings to a shapely (Multi)Polygon.
+
+    Esri outer rings are clockwise and holes are counter-clockwise; each hole
+    is attached to the outer ring that contains it.
+    """
+    shells, holes = [], []
+    for ring in rings:
+        coords = np.asarray(ring, dtype=float)[:, :2]
+        if len(coords) < 4:
+            continue
+        (holes if shapely.is_ccw(shapely.linearrings(coords)) else shells).append(coords)
+
+    # Some services write rings in the opposite orientation
+    if not shells:
+        shells, holes = holes, []
+
+    polygons = []
+    for shell in shells:
+        shell_polygon = Polygon(shell)
+        interiors = [h for h in holes if shell_polygon.contains(shapely.points(h[0]))]
+        polygons.append(Polygon(shell, interiors))
+
+    if not polygons:
+        return None
+    return polygons[0] if len(polygons) == 1 else MultiPolygon(polygons)
+
+
+def to_shapely(geometry):
+    """
+    Convert a session_state geometry ([lat, lon] point or list of [lat, lon]
+    pairs) into a shapely geometry in (lon, lat) order. Shapely geometries
+    are returned unchanged.
+    """
+    if isinstance(geometry, shapely.Geometry):
+        return geometry
+    coords = np.asarray(geometry, dtype=float)
+    if coords.ndim == 1:
+        return shapely.points(coords[::-1])
+    return shapely.linestrings(coords[:, ::-1])
+
+
+def polygon_to_rings(geometry) -> list:
+    """
+    Convert a shapely (Multi)Polygon to Esri rings: clockwise outer rings and
+    counter-clockwise holes, rounded to GEOMETRY_PRECISION.
+    """
+    rings = []
+    for polygon in shapely.get_parts(geometry):
+        polygon = orient(polygon, sign=-1.0)
+        for ring in [polygon.exterior, *polygon.interiors]:
+            rings.append(np.round(shapely.get_coordinates(ring), GEOMETRY_PRECISION).tolist())
+    return rings
+
+
+class IntersectResult:
+    """Intersect results in the same shape as AGOLQueryIntersect's values."""
+
+    def __init__(self, list_values: list, string_values: str, results: list = None):
+        self.list_values = list_values
+        self.string_values = string_values
+        self.results = results or []
+
+
+class GeographyIndex:
+    """
+    In-memory STRtree for each polygon geography layer.
+
+    Args:
+        layers (dict): Geography name -> {"geometries": array of shapely geometries,
+            "attributes": list of attribute dicts}.
+        built (float): Unix time the snapshot was downloaded.
+        last_edits (dict): Geography name -> the layer's lastEditDate at download time.
+        fields (dict, optional): Geography name -> the outFields the attributes were read with.
+    """
+
+    def __init__(self, layers: dict, built: float, last_edits: dict, fields: dict = None):
+        self.layers = layers
+        self.built = built
+        self.last_edits = last_edits
+        self.fields = fields or {}
+        self.trees = {name: STRtree(layer["geometries"]) for name, layer in layers.items()}
+        self._checked_at = 0.0
+        self._stale = False
+        self._generalized = {}   # (name, feature index, max_offset_m) -> Esri geometry
+        self._generalized_lock = threading.Lock()
+
+    @classmethod
+    def build(cls, configs: dict):
+        """
+        Download every configured layer and build a new index.
+
+        Args:
+            configs (dict): Geography name -> {"url", "layer", "fields"} as in
+                districts.DISTRICT_QUERIES.
+        """
+        layers, last_edits = {}, {}
+        for name, config in configs.items():
+            last_edits[name] = get_last_edit_date(config["url"], config["layer"])
+
+            geometries, attributes = [], []
+            for feature in iter_query_features(
+                config["url"], config["layer"], out_fields=config["fields"], return_geometry=True
+            ):
+                polygon = rings_to_polygon(feature.get("geometry", {}).get("rings", []))
+                if polygon is None:
+                    continue
+                geometries.append(polygon)
+                attributes.append(feature.get("attributes", {}))
+
+            layers[name] = {"geometries": np.array(geometries, dtype=object), "attributes": attributes}
+
+        return cls(layers, time.time(), last_edits, {name: config["fields"] for name, config in configs.items()})
+
+    @classmethod
+    def load(cls, path: str = SNAPSHOT_PATH):
+        """Load an index from a snapshot written by save()."""
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+        layers = {
+            name: {
+                "geometries": shapely.from_wkb(np.array(layer["wkb"], dtype=object)),
+                "attributes": layer["attributes"],
+            }
+            for name, layer in snapshot["layers"].items()
+        }
+        return cls(layers, snapshot["built"], snapshot["last_edits"], snapshot.get("fields"))
+
+    def save(self, path: str = SNAPSHOT_PATH):
+        """Write the index to disk as WKB plus attributes."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        snapshot = {
+            "built": self.built,
+            "last_edits": self.last_edits,
+            "fields": self.fields,
+            "layers": {
+                name: {"wkb": list(shapely.to_wkb(layer["geometries"])), "attributes": layer["attributes"]}
+                for name, layer in self.layers.items()
+            },
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def is_stale(self, configs: dict) -> bool:
+        """
+        True if the snapshot is older than SNAPSHOT_MAX_AGE, was built with
+        different layers or fields, or check_edits() found a layer edited
+        since it was built. Makes no requests.
+        """
+        if self._stale or time.time() - self.built > SNAPSHOT_MAX_AGE:
+            return True
+        if set(configs) - set(self.layers):
+            return True
+        return any(self.fields.get(name) != config["fields"] for name, config in configs.items())
+
+    def claim_edit_check(self) -> bool:
+        """
+        True if the layer edit dates are due to be checked, in which case the
+        caller is expected to run check_edits(). Only one caller per
+        EDIT_CHECK_INTERVAL gets True, so call it while holding a lock.
+        """
+        if time.time() - self._checked_at <= EDIT_CHECK_INTERVAL:
+            return False
+        self._checked_at = time.time()
+        return True
+
+    def check_edits(self, configs: dict) -> bool:
+        """
+        Compare every layer's lastEditDate with the snapshot's and mark the
+        index stale if any layer changed. Errors leave the index as it is.
+
+        Returns:
+            bool: True if the index is now stale.
+        """
+        for name, config in configs.items():
+            try:
+                last_edit = get_last_edit_date(config["url"], config["layer"])
+            except Exception as e:
+                logger.warning("Could not check %s for edits: %s", name, e)
+                continue
+            if last_edit is not None and last_edit != self.last_edits.get(name):
+                self._stale = True
+                break
+        return self._stale
+
+    def _esri_geometry(self, name: str, i: int, max_offset_m: float) -> dict:
+        """Return one polygon as generalized Esri rings, cached per tolerance."""
+        key = (name, int(i), max_offset_m)
+        with self._generalized_lock:
+            if key in self._generalized:
+                return self._generalized[key]
+
+        geometry = self.layers[name]["geometries"][i]
+        if max_offset_m:
+            geometry = shapely.simplify(geometry, max_offset_m / METERS_PER_DEGREE, preserve_topology=True)
+        esri_geometry = {"rings": polygon_to_rings(geometry), "spatialReference": {"wkid": 4326}}
+
+        with self._generalized_lock:
+            self._generalized[key] = esri_geometry
+        return esri_geometry
+
+    def intersect(self, name: str, geometry, list_field: str, string_field: str,
+                  return_geometry: bool = False, max_offset_m: float = 0) -> IntersectResult:
+        """
+        Return the features of one geography that intersect a point or route.
+
+        Args:
+            name (str): The geography name (e.g. "house").
+            geometry: A [lat, lon] point, a list of [lat, lon] pairs or a lon/lat shapely geometry.
+            list_field (str): Field whose unique values become list_values.
+            string_field (str): Field whose unique values are joined into string_values.
+            return_geometry (bool, optional): Include each feature's geometry in results.
+            max_offset_m (float, optional): Generalize returned geometry to this
+                tolerance in meters. 0 keeps full resolution.
+        """
+        layer = self.layers[name]
+        hits = np.sort(self.trees[name].query(to_shapely(geometry), predicate="intersects"))
+        attributes = [layer["attributes"][i] for i in hits]
+
+        results = []
+        for i, attrs in zip(hits, attributes):
+            feature = {"attributes": attrs}
+            if return_geometry:
+                feature["geometry"] = self._esri_geometry(name, i, max_offset_m)
+            results.append(feature)
+
+        list_values = list(dict.fromkeys(a.get(list_field) for a in attributes if a.get(list_field) is not None))
+        string_values = list(dict.fromkeys(a.get(string_field) for a in attributes if a.get(string_field) is not None))
+        return IntersectResult(list_values, ",".join(map(str, string_values)), results)
+
+
+_index = None
+_index_lock = threading.Lock()
+_building = False            # a background build is running
+_build_failed_at = 0.0       # time of the last failed background build
+_snapshot_mtime = None       # mtime of the snapshot file last loaded (or tried)
+
+
+def build_snapshot(configs: dict, path: str = SNAPSHOT_PATH) -> GeographyIndex:
+    """
+    Download every configured layer, save the snapshot and make it the
+    process-wide index. Blocks for as long as the downloads take, so it is
+    meant for the offline sync and the background build.
+    """
+    global _index, _snapshot_mtime
+    index = GeographyIndex.build(configs)
+    index.save(path)
+    with _index_lock:
+        _index = index
+        _snapshot_mtime = os.path.getmtime(path)
+    return index
+
+
+def _background_build(configs: dict):
+    global _building, _build_failed_at
+    try:
+        build_snapshot(configs)
+        logger.info("Geography index snapshot rebuilt")
+    except Exception as e:
+        logger.warning("Geography index build failed, retrying in %ss: %s", BUILD_RETRY_INTERVAL, e)
+        with _index_lock:
+            _build_failed_at = time.time()
+    finally:
+        with _index_lock:
+            _building = False
+
+
+def _start_background_build(configs: dict):
+    """Start a background build unless one is running or the last one failed recently. Hold _index_lock."""
+    global _building
+    if _building or time.time() - _build_failed_at < BUILD_RETRY_INTERVAL:
+        return
+    _building = True
+    threading.Thread(
+        target=_background_build, args=(configs,), name="geography-index-build", daemon=True
+    ).start()
+
+
+def _load_snapshot():
+    """Load the snapshot if the file changed since the last attempt. Hold _index_lock."""
+    global _snapshot_mtime
+    try:
+        mtime = os.path.getmtime(SNAPSHOT_PATH)
+    except OSError:
+        return None
+    if mtime == _snapshot_mtime:
+        return None
+    _snapshot_mtime = mtime
+    try:
+        return GeographyIndex.load(SNAPSHOT_PATH)
+    except Exception as e:
+        logger.warning("Could not load geography snapshot %s: %s", SNAPSHOT_PATH, e)
+        return None
+
+
+def get_geography_index(configs: dict, build: bool = True):
+    """
+    Return the process-wide GeographyIndex, or None if it is stale or unavailable.
+
+    Only the snapshot on disk is ever loaded here. When there is no usable
+    snapshot, a background build is started (with ``build``) and callers use
+    remote queries until it finishes. Layer edit dates are checked outside
+    the lock, by one caller per EDIT_CHECK_INTERVAL.
+    """
+    global _index
+
+    with _index_lock:
+        index = _index if _index is not None else _load_snapshot()
+        if index is None or index.is_stale(configs):
+            _index = None
+            if build:
+                _start_background_build(configs)
+            return None
+        _index = index
+        check_edits = index.claim_edit_check()
+
+    if check_edits and index.check_edits(configs):
+        with _index_lock:
+            if _index is index:
+                _index = None
+            if build:
+                _start_background_build(configs)
+        return None
+
+    return index
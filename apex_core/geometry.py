@@ -0,0 +1,251 @@
+"""
+Coordinate normalization for uploaded and drawn geometries.
+
+Everything the app stores in session_state is [lat, lon] in WGS84 (EPSG:4326),
+rounded to six decimal places. Uploaded geometries are reprojected from their
+source CRS with pyproj on whole coordinate arrays, and the axis swap and
+rounding are done as NumPy operations.
+
+A project may have several site points or a multipart route, so
+selected_point is either one [lat, lon] pair or a list of them, and
+selected_route is either one path of [lat, lon] pairs or a list of paths.
+as_points() and as_paths() normalize both forms.
+
+Dense routes are simplified before they are sent to intersection queries or
+drawn on maps; the full-resolution route is what gets stored.
+"""
+
+import os
+import hashlib
+import threading
+from numbers import Real
+from functools import lru_cache
+from collections import OrderedDict
+import numpy as np
+import shapely
+from pyproj import CRS, Transformer
+
+
+TARGET_CRS = "EPSG:4326"
+COORDINATE_PRECISION = 6
+
+# Routes are simplified in Alaska Albers so the tolerance is in meters
+SIMPLIFY_CRS = "EPSG:3338"
+SIMPLIFY_TOLERANCE_M = float(os.environ.get("APEX_SIMPLIFY_TOLERANCE_M", 5))
+SIMPLIFY_CACHE_SIZE = 32
+
+_simplified_routes = OrderedDict()   # (content hash, tolerance) -> SimplifiedRoute
+_simplified_routes_lock = threading.Lock()
+
+
+@lru_cache(maxsize=32)
+def get_transformer(src_crs: str, dst_crs: str = TARGET_CRS) -> Transformer:
+    """
+    Return a transformer between two CRS definitions, building it once per
+    (source, destination) pair for the whole process. Transformers are
+    thread-safe in pyproj >= 3.1, so every session shares them.
+
+    Args:
+        src_crs (str): Source CRS as WKT, an authority string or a PROJ string.
+        dst_crs (str, optional): Destination CRS. Defaults to EPSG:4326.
+
+    Returns:
+        Transformer: A transformer that takes and returns x/y (lon/lat) order.
+    """
+    return Transformer.from_crs(CRS.from_user_input(src_crs), CRS.from_user_input(dst_crs), always_xy=True)
+
+
+def crs_key(crs) -> str:
+    """Return a hashable key for a CRS object, or None if the CRS is unknown."""
+    if crs is None:
+        return None
+    crs = CRS.from_user_input(crs)
+    authority = crs.to_authority()
+    return ":".join(authority) if authority else crs.to_wkt()
+
+
+def to_lonlat(coords, src_crs=None) -> np.ndarray:
+    """
+    Reproject an array of x/y coordinates to WGS84 lon/lat.
+
+    Args:
+        coords: (N, 2) or longer array-like of x/y coordinates. Extra
+            dimensions (Z, M) are dropped.
+        src_crs (optional): The source CRS (pyproj CRS, EPSG code, WKT...).
+            None or WGS84 leaves the coordinates as they are.
+
+    Returns:
+        np.ndarray: (N, 2) float64 lon/lat array.
+    """
+    xy = np.asarray(coords, dtype=float)
+    xy = xy.reshape(-1, xy.shape[-1])[:, :2]
+    key = crs_key(src_crs)
+    if key is None or key == TARGET_CRS:
+        return xy
+    lon, lat = get_transformer(key).transform(xy[:, 0], xy[:, 1])
+    return np.column_stack((lon, lat))
+
+
+def to_latlon_list(lonlat) -> list:
+    """Swap lon/lat coordinates to [lat, lon] pairs rounded for session_state."""
+    lonlat = np.asarray(lonlat, dtype=float).reshape(-1, 2)
+    return np.round(lonlat[:, ::-1], COORDINATE_PRECISION).tolist()
+
+
+def to_latlon_paths(parts, src_crs=None) -> list:
+    """
+    Reproject an array of shapely LineStrings and return them as [lat, lon] paths.
+
+    The coordinates of all parts are transformed in a single call and then
+    split back into one path per part.
+    """
+    coords, index = shapely.get_coordinates(parts, return_index=True)
+    if not len(coords):
+        return []
+    latlon = np.round(to_lonlat(coords, src_crs)[:, ::-1], COORDINATE_PRECISION)
+    splits = np.flatnonzero(np.diff(index)) + 1
+    return [path.tolist() for path in np.split(latlon, splits)]
+
+
+def merge_lines(geometries):
+    """
+    Merge line features into as few paths as possible.
+
+    Contiguous segments are joined with shapely's union_all and line_merge;
+    parts that don't touch are kept as separate LineStrings.
+
+    Args:
+        geometries: Array-like of LineStrings and MultiLineStrings.
+
+    Returns:
+        np.ndarray: Array of merged shapely LineStrings.
+    """
+    merged = shapely.line_merge(shapely.union_all(np.asarray(geometries)))
+    parts = shapely.get_parts(merged)
+    return parts[shapely.get_num_coordinates(parts) >= 2]
+
+
+def as_points(selected_point) -> list:
+    """Return selected_point as a list of [lat, lon] pairs."""
+    if not selected_point:
+        return []
+    if isinstance(selected_point, dict):
+        return [[selected_point.get("y"), selected_point.get("x")]]
+    if isinstance(selected_point[0], Real):
+        return [list(selected_point)]
+    return [list(point) for point in selected_point]
+
+
+def as_paths(selected_route) -> list:
+    """Return selected_route as a list of paths of [lat, lon] pairs."""
+    if not selected_route:
+        return []
+    first = selected_route[0]
+    if isinstance(first, dict) or isinstance(first[0], Real):
+        return [selected_route]
+    return list(selected_route)
+
+
+def from_points(points: list):
+    """Store a list of [lat, lon] pairs as selected_point (a single pair when there is one)."""
+    if not points:
+        return None
+    return points[0] if len(points) == 1 else points
+
+
+def from_paths(paths: list):
+    """Store a list of [lat, lon] paths as selected_route (a single path when there is one)."""
+    if not paths:
+        return None
+    return paths[0] if len(paths) == 1 else paths
+
+
+def points_shape(selected_point):
+    """Return selected_point as a shapely Point or MultiPoint in lon/lat order."""
+    coords = np.asarray(as_points(selected_point), dtype=float)[:, ::-1]
+    return shapely.points(coords[0]) if len(coords) == 1 else shapely.multipoints(coords)
+
+
+def route_shape(selected_route):
+    """Return selected_route as a shapely LineString or MultiLineString in lon/lat order."""
+    lines = [shapely.linestrings(np.asarray(path, dtype=float)[:, ::-1]) for path in as_paths(selected_route)]
+    return lines[0] if len(lines) == 1 else shapely.multilinestrings(lines)
+
+
+def geometry_hash(value) -> str:
+    """Return a content hash of a session_state geometry (point(s) or route)."""
+    return hashlib.blake2b(repr(value).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def to_esri_geometry(geometry) -> dict:
+    """
+    Convert a lon/lat shapely Point, MultiPoint, LineString or MultiLineString
+    into an ArcGIS JSON geometry in WGS84.
+    """
+    spatial_reference = {"wkid": 4326}
+    geom_type = geometry.geom_type
+    if geom_type == "Point":
+        return {"x": geometry.x, "y": geometry.y, "spatialReference": spatial_reference}
+    if geom_type == "MultiPoint":
+        return {"points": shapely.get_coordinates(geometry).tolist(), "spatialReference": spatial_reference}
+    if geom_type in ("LineString", "MultiLineString"):
+        paths = [shapely.get_coordinates(part).tolist() for part in shapely.get_parts(geometry)]
+        return {"paths": paths, "spatialReference": spatial_reference}
+    raise ValueError(f"Unsupported geometry type: {geom_type}")
+
+
+class SimplifiedRoute:
+    """A simplified route with the vertex counts before and after simplification."""
+
+    def __init__(self, route, vertices_before: int, vertices_after: int):
+        self.route = route
+        self.vertices_before = vertices_before
+        self.vertices_after = vertices_after
+
+
+def simplify_route(selected_route, tolerance_m: float = SIMPLIFY_TOLERANCE_M) -> SimplifiedRoute:
+    """
+    Simplify a route for intersection queries and map display.
+
+    Every path is projected to Alaska Albers and simplified with shapely's
+    topology-preserving Douglas-Peucker, so the tolerance is in meters and
+    paths keep their endpoints and don't self-intersect. Results are cached by
+    content hash, so reruns with the same route reuse the simplified copy.
+
+    Args:
+        selected_route: A route in selected_route form (one path or a list of paths).
+        tolerance_m (float, optional): Maximum deviation in meters. 0 disables
+            simplification. Defaults to SIMPLIFY_TOLERANCE_M.
+
+    Returns:
+        SimplifiedRoute: The simplified route in selected_route form, with the
+            vertex counts before and after.
+    """
+    paths = as_paths(selected_route)
+    latlon = np.asarray([point for path in paths for point in path], dtype=float).reshape(-1, 2)
+    index = np.repeat(np.arange(len(paths)), [len(path) for path in paths])
+    if tolerance_m <= 0 or any(len(path) < 2 for path in paths):
+        return SimplifiedRoute(selected_route, len(latlon), len(latlon))
+
+    key = (hashlib.blake2b(latlon.tobytes() + index.tobytes(), digest_size=16).hexdigest(), tolerance_m)
+    with _simplified_routes_lock:
+        if key in _simplified_routes:
+            _simplified_routes.move_to_end(key)
+            return _simplified_routes[key]
+
+    x, y = get_transformer(TARGET_CRS, SIMPLIFY_CRS).transform(latlon[:, 1], latlon[:, 0])
+    lines = shapely.linestrings(np.column_stack((x, y)), indices=index)
+    simplified = shapely.simplify(lines, tolerance_m, preserve_topology=True)
+
+    coords, parts = shapely.get_coordinates(simplified, return_index=True)
+    lon, lat = get_transformer(SIMPLIFY_CRS, TARGET_CRS).transform(coords[:, 0], coords[:, 1])
+    latlon_simplified = np.round(np.column_stack((lat, lon)), COORDINATE_PRECISION)
+    splits = np.flatnonzero(np.diff(parts)) + 1
+    route = from_paths([path.tolist() for path in np.split(latlon_simplified, splits)])
+
+    result = SimplifiedRoute(route, len(latlon), len(coords))
+    with _simplified_routes_lock:
+        _simplified_routes[key] = result
+        while len(_simplified_routes) > SIMPLIFY_CACHE_SIZE:
+            _simplified_routes.popitem(last=False)
+    return result
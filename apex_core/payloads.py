@@ -0,0 +1,548 @@
+"""
+ArcGIS applyEdits payloads for a project and its child layers.
+
+Every builder is a pure function of a ProjectDraft, so the Streamlit app and
+batch jobs produce identical payloads. Builders raise RuntimeError when a
+payload can't be built and return None when there is nothing to add.
+"""
+
+from shapely.geometry import LineString, Point
+import datetime
+from .agol import select_records, generalization_params
+from .districts import GEOGRAPHY_FETCH
+from .draft import ProjectDraft
+from .geometry import as_points, as_paths
+
+
+COMMUNITIES_URL = (
+    "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/"
+    "All_Alaska_Communities_Baker/FeatureServer"
+)
+COMMUNITIES_LAYER = 7
+
+
+def clean_payload(payload: dict) -> dict:
+    """
+    Remove any attributes set to None, 0, or ''.
+    """
+    cleaned = dict(payload)
+    new_adds = []
+
+    for add in payload.get("adds", []):
+        attrs = add.get("attributes", {})
+        filtered_attrs = {
+            k: v for k, v in attrs.items()
+            if v is not None and v != 0 and v != ""
+        }
+        new_add = dict(add)
+        new_add["attributes"] = filtered_attrs
+        new_adds.append(new_add)
+
+    cleaned["adds"] = new_adds
+    return cleaned
+
+def to_date_string(value):
+    """
+    Convert a datetime.date or datetime.datetime to a string.
+    - If value is "REMOVE", return "REMOVE".
+    - If value is None or not a valid date/datetime, return "REMOVE".
+    - Otherwise return an ISO 8601 string (YYYY-MM-DD).
+    """
+    if value is None:
+        return None
+
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        # Promote date to datetime at midnight
+        value = datetime.datetime.combine(value, datetime.time())
+
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d")
+
+    # Anything else is invalid
+    return 
+
+
+def get_line_center(line_geom):
+    """
+    Given a Shapely LineString or a list of coordinates,
+    return the center point (midpoint along its length).
+    For a multipart route (a list of paths) the longest path is used.
+    """
+    # If input is a list of coordinates (or paths), convert to LineString
+    if isinstance(line_geom, list):
+        line_geom = max((LineString(path) for path in as_paths(line_geom)), key=lambda line: line.length)
+    
+    if not isinstance(line_geom, LineString):
+        raise ValueError("Geometry must be a LineString or list of coordinates")
+    
+    # Find halfway distance along the line
+    midpoint_distance = line_geom.length / 2.0
+    center_point = line_geom.interpolate(midpoint_distance)
+    
+    # Return as a tuple (lon, lat)
+    return (center_point.x, center_point.y)
+
+
+
+def clean_payloads(payloads: dict) -> dict:
+    """
+    Remove any attribute entries marked as 'REMOVE'.
+    """
+    cleaned = {}
+    for key, payload in payloads.items():
+        new_payload = payload.copy()
+        new_adds = []
+        for add in payload.get("payload", {}).get("adds", []):
+            attrs = add.get("attributes", {})
+            filtered_attrs = {k: v for k, v in attrs.items() if v != "REMOVE"}
+            # preserve geometry if present
+            new_add = {"attributes": filtered_attrs}
+            if "geometry" in add:
+                new_add["geometry"] = add["geometry"]
+            new_adds.append(new_add)
+        new_payload["payload"] = {"adds": new_adds}
+        cleaned[key] = new_payload
+    return cleaned
+
+
+
+def project_payload(draft: ProjectDraft):
+    try:
+        # Determine center based on selected geometry
+        center = None
+        if draft.selected_point:
+            pt = draft.selected_point
+            if isinstance(pt, Point):
+                center = (pt.x, pt.y)
+            else:
+                # Centroid of the site points
+                points = as_points(pt)
+                center = (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+            proj_type = "Site"
+        elif draft.selected_route:
+            route = draft.selected_route
+            center = get_line_center(route)
+            proj_type = "Route"
+
+        # Build payload with .get() and default None
+        payload = {
+            "adds": [
+                {
+                    "attributes": {
+                        "Proj_Type": proj_type,
+                        "AWP_Proj_Name": draft.awp_proj_name,
+                        "Proj_Name": draft.proj_name,
+                        "IRIS": draft.iris,
+                        "STIP": draft.stip,
+                        "Fed_Proj_Num": draft.fed_proj_num,
+                        "AWP_Proj_Desc": draft.awp_proj_desc,
+                        "Proj_Desc": draft.proj_desc,
+                        "Proj_Purp": draft.proj_purp,
+                        "Proj_Impact": draft.proj_impact,
+                        "Proj_Prac": draft.proj_prac,
+                        "Phase": draft.phase,
+                        "Fund_Type": draft.fund_type,
+                        "TenAdd": to_date_string(draft.tenadd),
+                        "Awarded": "Yes" if draft.contractor else "No",
+                        "Award_Date": to_date_string(draft.award_date),
+                        "Award_Fiscal_Year": draft.award_fiscal_year,
+                        "Contractor": draft.contractor,
+                        "Awarded_Amount": draft.awarded_amount,
+                        "Current_Contract_Amount": draft.current_contract_amount,
+                        "Amount_Paid_to_Date": draft.amount_paid_to_date,
+                        "Anticipated_Start": draft.anticipated_start,
+                        "Anticipated_End": draft.anticipated_end,
+                        "Construction_Year": draft.construction_year,
+                        "New_Continuing": draft.new_continuing,
+                        "Route_ID": draft.route_ids,
+                        "Route_Name": draft.route_names,
+                        "Impact_Comm": draft.impact_comm_names,
+                        "DOT_PF_Region": draft.region_string,
+                        "Borough_Census_Area": draft.borough_string,
+                        "Senate_District": draft.senate_string,
+                        "House_District": draft.house_string,
+                        "Proj_Web": draft.proj_web,
+                        "APEX_Mapper_Link": draft.apex_mapper_link,
+                        'Submitted_By': draft.submitted_by,
+                        "Database_Status": "Review: Awaiting Review",
+                        "Database_Status_Notes": draft.database_status_notes,
+                        "AWP_GUID": draft.awp_globalid,
+                    },
+                    "geometry": {
+                        "x": center[1] if center else None,  # longitude
+                        "y": center[0] if center else None,  # latitude
+                        "spatialReference": {"wkid": 4326}
+                    }
+                }
+            ]
+        }
+
+        return clean_payload(payload)
+
+    except Exception as e:
+        # Bubble up error so caller can report it
+        raise RuntimeError(f"Error building project payload: {e}")
+    
+
+
+
+
+def geometry_payload(draft: ProjectDraft, globalid: str):
+    try:
+        # Point case (one site feature per point)
+        if draft.selected_point:
+            payload = {
+                "adds": [
+                    {
+                        "attributes": { 
+                            "Site_AWP_Proj_Name": draft.awp_proj_name,
+                            "Site_Proj_Name": draft.proj_name,
+                            "Site_DOT_PF_Region": draft.region_string,
+                            "Site_Borough_Census_Area": draft.borough_string,
+                            "Site_Senate_District": draft.senate_string,
+                            "Site_House_District": draft.house_string,
+                            "parentglobalid": globalid
+
+                        },
+                        "geometry": {
+                            "x": pt[1],
+                            "y": pt[0],
+                            "spatialReference": {"wkid": 4326}
+                        }
+                    }
+                    for pt in as_points(draft.selected_point)
+                ]
+            }
+            return payload
+
+        # Route case
+        elif draft.selected_route:
+            route = draft.selected_route
+            payload = {
+                "adds": [
+                    {
+                        "attributes": { 
+                            "Route_AWP_Proj_Name": draft.awp_proj_name,
+                            "Route_Proj_Name": draft.proj_name,
+                            "Route_DOT_PF_Region": draft.region_string,
+                            "Route_Borough_Census_Area": draft.borough_string,
+                            "Route_Senate_District": draft.senate_string,
+                            "Route_House_District": draft.house_string,
+                            "parentglobalid": globalid
+
+                        },
+                        "geometry": {
+                            "paths": [
+                                [
+                                    [pt[1], pt[0]] if isinstance(pt, (list, tuple)) else [pt.get("x"), pt.get("y")]
+                                    for pt in path
+                                ]
+                                for path in as_paths(route)
+                            ],
+                            "spatialReference": {"wkid": 4326}
+                        }
+                    }
+                ]
+            }
+            return clean_payload(payload)
+
+        else:
+            return None
+
+    except Exception as e:
+        raise RuntimeError(f"Error building geometry payload: {e}")
+    
+
+
+
+def communities_payload(draft: ProjectDraft, globalid: str):
+    """
+    Build an ArcGIS applyEdits payload for impacted communities.
+    Returns None if no impacted communities exist or no valid records are found.
+    """
+    try:
+        comm_list = draft.impact_comm_ids
+        if not comm_list:
+            # Valid case: nothing to add
+            return None
+
+        payload = {"adds": []}
+
+        # One request for every selected community
+        comms_records = select_records(
+            COMMUNITIES_URL,
+            COMMUNITIES_LAYER,
+            "DCCED_CommunityId",
+            comm_list,
+            fields="OverallName,Latitude,Longitude"
+        )
+
+        for comm_id in comm_list:
+            comms_data = comms_records.get(str(comm_id))
+
+            if not comms_data:
+                # Skip silently if no record found
+                continue
+
+            attrs = comms_data.get("attributes", {})
+            name = attrs.get("OverallName")
+            y = attrs.get("Latitude")
+            x = attrs.get("Longitude")
+
+            if name and y is not None and x is not None:
+                payload["adds"].append({
+                    "attributes": {
+                        "Community_Name": name,
+                        "parentglobalid": globalid
+                    },
+                    "geometry": {
+                        "x": x,
+                        "y": y,
+                        "spatialReference": {"wkid": 4326}
+                    }
+                })
+            # If required fields are missing, skip this community instead of raising
+
+        if not payload["adds"]:
+            # Valid case: no usable community records
+            return None
+
+        return clean_payload(payload)
+
+    except Exception as e:
+        raise RuntimeError(f"Error building communities payload: {e}")
+    
+
+
+def contacts_payload(draft: ProjectDraft, globalid: str):
+    try: 
+        contact_list = draft.contacts
+        if not contact_list:
+            return None
+
+        payload = {"adds": []}
+
+        # Add contacts to payload
+        for contact in contact_list:
+            payload["adds"].append({
+                "attributes": {
+                    "Contact_Role": contact.get("Role", ""),
+                    "Contact_Name": contact.get("Name", ""),
+                    "Contact_Email": contact.get("Email", ""),
+                    "Contact_Phone": contact.get("Phone", ""),
+                    "parentglobalid": globalid
+                }
+            })
+
+        return clean_payload(payload)
+
+    except Exception as e:
+        raise RuntimeError(f"Error building contacts payload: {e}")
+
+
+
+
+def _geography_records(draft: ProjectDraft, name: str, id_field: str, id_list: list, service_info: dict) -> dict:
+    """
+    Return the features for a geography's IDs, keyed by ID.
+
+    Features the district queries returned (draft.geography_features) are
+    reused; only IDs missing from them are queried.
+    """
+    wanted = {str(item_id) for item_id in id_list}
+    stored = draft.geography_features.get(name, {})
+    records = {key: feature for key, feature in stored.items() if key in wanted}
+    missing = [item_id for item_id in id_list if str(item_id) not in records]
+    if missing:
+        records.update(select_records(
+            service_info["url"], service_info["layer"], id_field, missing,
+            fields=GEOGRAPHY_FETCH[name]["fields"], return_geometry=True,
+            extra_params=generalization_params(GEOGRAPHY_FETCH[name]["max_offset_m"])
+        ))
+    return records
+
+
+def geography_payload(draft: ProjectDraft, globalid: str, name: str):
+    """
+    Build a payload containing attributes and geometry for a given geography type.
+
+    Parameters
+    ----------
+    draft : ProjectDraft
+        The project, with the geography IDs from the district queries.
+    globalid : str
+        The parent GlobalID to associate with the payload.
+    name : str
+        The geography type to process. Must be one of:
+        'region', 'borough', 'senate', or 'house'.
+
+    Returns
+    -------
+    dict
+        A cleaned payload dictionary containing 'adds' entries with
+        attributes and geometry for the specified geography type.
+        None if the geography has no IDs. Features from the district
+        queries are reused; anything else is fetched with only the
+        attributes in GEOGRAPHY_FETCH and geometry generalized by the server
+        to that geography's max_offset_m.
+    """
+
+    # Dictionary of services keyed by geography name, with base URL and layer index
+    geography_dict = {
+        "region": {
+            "url": "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/STIP_DOT_PF_Regions/FeatureServer",
+            "layer": 0
+        },
+        "borough": {
+            "url": "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/STIP_BoroughCensus/FeatureServer",
+            "layer": 0
+        },
+        "senate": {
+            "url": "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/STIP_SenateDistricts/FeatureServer",
+            "layer": 0
+        },
+        "house": {
+            "url": "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/STIP_HouseDistricts/FeatureServer",
+            "layer": 0
+        },
+        "route": {
+            "url": "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/AKDOT_Routes_Mileposts/FeatureServer",
+            "layer": 0
+        }
+    }
+
+    payload = {}
+
+    # REGION
+    if name == 'region':
+        id_list = draft.geography_ids(name)
+        service_info = geography_dict.get(name)
+        if not id_list or not service_info:
+            return None
+        payload = {"adds": []}
+        # Reuse the intersect results, querying AGOL only for records it lacks
+        records = _geography_records(draft, name, "GlobalID", id_list, service_info)
+        for item_id in id_list:
+            data = records.get(str(item_id))
+            if not data:
+                continue
+            attrs = data.get("attributes", {})
+            geom = data.get("geometry", {})
+            region_name = attrs.get("NameAlt")
+            payload["adds"].append({
+                "attributes": {
+                    "Region_Name": region_name,
+                    "parentglobalid": globalid,
+                },
+                "geometry": geom
+            })
+
+    # BOROUGH
+    if name == 'borough':
+        id_list = draft.geography_ids(name)
+        service_info = geography_dict.get(name)
+        if not id_list or not service_info:
+            return None
+        payload = {"adds": []}
+        records = _geography_records(draft, name, "GlobalID", id_list, service_info)
+        for item_id in id_list:
+            data = records.get(str(item_id))
+            if not data:
+                continue
+            attrs = data.get("attributes", {})
+            geom = data.get("geometry", {})
+            fips = attrs.get('FIPS')
+            borough_name = attrs.get("NameAlt")
+            payload["adds"].append({
+                "attributes": {
+                    "Bor_FIPS": fips,
+                    "Bor_Name": borough_name,
+                    "parentglobalid": globalid,
+                },
+                "geometry": geom
+            })
+
+    # SENATE
+    if name == 'senate':
+        id_list = draft.geography_ids(name)
+        service_info = geography_dict.get(name)
+        if not id_list or not service_info:
+            return None
+        payload = {"adds": []}
+        records = _geography_records(draft, name, "GlobalID", id_list, service_info)
+        for item_id in id_list:
+            data = records.get(str(item_id))
+            if not data:
+                continue
+            attrs = data.get("attributes", {})
+            geom = data.get("geometry", {})
+            district = attrs.get("DISTRICT")
+            payload["adds"].append({
+                "attributes": {
+                    "Senate_District_Name": district,
+                    "parentglobalid": globalid,
+                },
+                "geometry": geom
+            })
+
+    # HOUSE
+    if name == 'house':
+        id_list = draft.geography_ids(name)
+        service_info = geography_dict.get(name)
+        if not id_list or not service_info:
+            return None
+        payload = {"adds": []}
+        records = _geography_records(draft, name, "GlobalID", id_list, service_info)
+        for item_id in id_list:
+            data = records.get(str(item_id))
+            if not data:
+                continue
+            attrs = data.get("attributes", {})
+            geom = data.get("geometry", {})
+            house_num = attrs.get("DISTRICT")
+            house_name = attrs.get("HOUSE_NAME")
+            senate = attrs.get("SENATE_DISTRICT")
+            payload["adds"].append({
+                "attributes": {
+                    "House_District_Num": house_num,
+                    "House_District_Name": house_name,
+                    "House_Senate_District": senate,
+                    "parentglobalid": globalid,
+                },
+                "geometry": geom
+            })
+
+
+    # routes
+    if name == 'route':
+        id_list = draft.geography_ids(name)
+        service_info = geography_dict.get(name)
+        if not id_list or not service_info:
+            return None
+        payload = {"adds": []}
+        records = _geography_records(draft, name, "Route_ID", id_list, service_info)
+        for item_id in id_list:
+            data = records.get(str(item_id))
+            if not data:
+                continue
+            attrs = data.get("attributes", {})
+            geom = data.get("geometry", {})
+            route_id = attrs.get("Route_ID")
+            route_name = attrs.get("Route_Name")
+            payload["adds"].append({
+                "attributes": {
+                    "Impacted_Route_ID": route_id,
+                    "Impacted_Route_Name": route_name,
+                    "parentglobalid": globalid,
+                },
+                "geometry": geom
+            })
+
+
+
+    # Return cleaned payload
+    if payload == {}:
+        return None
+    
+    else:
+        return clean_payload(payload)
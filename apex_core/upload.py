@@ -0,0 +1,229 @@
+"""
+Upload a ProjectDraft to the APEX Feature Service.
+
+The atomic upload builds every payload up front, links the child features to
+the project with client-generated GlobalIDs and sends all layers in a single
+service-level applyEdits call with rollbackOnFailure, so the project is either
+stored completely or not at all.
+
+The parallel upload inserts the project first and then builds and loads the
+child layers concurrently, yielding each layer's result as it finishes.
+"""
+
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .agol import AGOLDataLoader, AGOLServiceEditor
+from .draft import ProjectDraft
+from .payloads import project_payload, communities_payload, geometry_payload, contacts_payload, geography_payload
+
+
+APEX_URL = "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/service_0d036ae7c0a7424088ee565727d1bb66/FeatureServer"
+
+# APEX layer IDs
+PROJECTS_LAYER = 0
+SITE_LAYER = 1
+ROUTE_LAYER = 2
+COMMUNITIES_LAYER = 3
+CONTACTS_LAYER = 9
+GEOGRAPHY_LAYERS = {
+    "region": 4,
+    "borough": 5,
+    "senate": 6,
+    "house": 7,
+    "route": 8
+}
+
+logger = logging.getLogger("upload")
+
+
+def new_globalid() -> str:
+    """Generate a GlobalID in the braced, upper-case format ArcGIS uses."""
+    return "{" + str(uuid.uuid4()).upper() + "}"
+
+
+def assign_globalids(payload: dict) -> dict:
+    """Give every add in a payload its own client-generated GlobalID."""
+    for add in payload.get("adds", []):
+        add.setdefault("attributes", {})["GlobalID"] = new_globalid()
+    return payload
+
+
+def _child_builders(draft: ProjectDraft, globalid: str) -> dict:
+    """
+    Payload name -> (layer ID, builder, required, label for messages) for
+    every child layer the project has.
+    """
+    geometry_layer = SITE_LAYER if draft.selected_point else ROUTE_LAYER
+    builders = {
+        "geometry": (geometry_layer, lambda: geometry_payload(draft, globalid), True, "Geometry"),
+        "communities": (COMMUNITIES_LAYER, lambda: communities_payload(draft, globalid), False, "Communities"),
+        "contacts": (CONTACTS_LAYER, lambda: contacts_payload(draft, globalid), False, "Contacts"),
+    }
+    for name, layer_id in GEOGRAPHY_LAYERS.items():
+        if name == "route" and not draft.selected_route:
+            continue
+        if draft.geography_ids(name) is not None:
+            builders[name] = (
+                layer_id, lambda name=name: geography_payload(draft, globalid, name), False, "Geography"
+            )
+    return builders
+
+
+def _log_build_error(name: str, error: Exception):
+    logger.warning("Skipping %s: %s", name, error)
+
+
+def build_child_payloads(draft: ProjectDraft, globalid: str, on_error=None) -> dict:
+    """
+    Build the geometry, communities, contacts and geography payloads for a project.
+
+    Args:
+        draft (ProjectDraft): The project.
+        globalid (str): The project GlobalID the children point to.
+        on_error (callable, optional): Called as ``on_error(name, error)`` when the
+            communities or contacts payload can't be built; that layer is then
+            skipped. Defaults to logging a warning. Other build errors are raised.
+
+    Returns:
+        dict: Payload name ("geometry", "communities", "contacts", "region", ...) ->
+            (layer ID, payload). Payloads with nothing to add are omitted.
+    """
+    on_error = on_error or _log_build_error
+    payloads = {}
+    for name, (layer_id, build, _, _) in _child_builders(draft, globalid).items():
+        try:
+            payloads[name] = (layer_id, build())
+        except RuntimeError as e:
+            if name not in ("communities", "contacts"):
+                raise
+            on_error(name, e)
+
+    return {name: value for name, value in payloads.items() if value[1] and value[1].get("adds")}
+
+
+def build_project_edits(draft: ProjectDraft, on_error=None) -> tuple:
+    """
+    Build every payload for a project with client-generated GlobalIDs.
+
+    Args:
+        draft (ProjectDraft): The project.
+        on_error (callable, optional): Passed to build_child_payloads().
+
+    Returns:
+        tuple: The project GlobalID and a dict of payload name ("project",
+            "geometry", "communities", ...) -> (layer ID, payload).
+
+    Raises:
+        RuntimeError: If the project or geometry payload can't be built.
+    """
+    globalid = new_globalid()
+
+    project = project_payload(draft)
+    if not project or not project.get("adds"):
+        raise RuntimeError("Failed to build project payload")
+    project["adds"][0]["attributes"]["GlobalID"] = globalid
+
+    children = build_child_payloads(draft, globalid, on_error)
+    if "geometry" not in children:
+        raise RuntimeError("Failed to build project geometry payload")
+
+    named_payloads = {"project": (PROJECTS_LAYER, project)}
+    for name, (layer_id, payload) in children.items():
+        named_payloads[name] = (layer_id, assign_globalids(payload))
+    return globalid, named_payloads
+
+
+def send_project_edits(globalid: str, named_payloads: dict, url: str = APEX_URL) -> dict:
+    """
+    Send the payloads from build_project_edits() in one applyEdits transaction.
+
+    Returns:
+        dict: "success", "message", "globalid" (the project GlobalID, None on
+            failure) and "layers", mapping each payload name ("project",
+            "geometry", "communities", ...) to its own success/message.
+    """
+    result = AGOLServiceEditor(url).add_features(
+        {layer_id: payload for layer_id, payload in named_payloads.values()}
+    )
+
+    layers = {}
+    for name, (layer_id, _) in named_payloads.items():
+        layer_result = result["results"].get(layer_id)
+        layers[name] = layer_result or {"success": result["success"], "message": result["message"]}
+
+    return {
+        "success": result["success"],
+        "message": result["message"],
+        "globalid": globalid if result["success"] else None,
+        "layers": layers
+    }
+
+
+def upload_project_atomic(draft: ProjectDraft, url: str = APEX_URL, on_error=None) -> dict:
+    """
+    Upload the project and all of its child records in one applyEdits transaction.
+
+    Args:
+        draft (ProjectDraft): The project.
+        url (str, optional): The APEX Feature Service URL.
+        on_error (callable, optional): Passed to build_child_payloads().
+
+    Returns:
+        dict: As send_project_edits(). Payload build errors are returned as a
+            failure without sending anything.
+    """
+    try:
+        globalid, named_payloads = build_project_edits(draft, on_error)
+    except Exception as e:
+        return {"success": False, "message": f"Payload error: {e}", "globalid": None, "layers": {}}
+    return send_project_edits(globalid, named_payloads, url)
+
+
+def _load_child(url: str, layer_id: int, build, required: bool, label: str):
+    """
+    Build one child payload and load it with applyEdits.
+
+    Returns:
+        dict: The loader result, or None if there was nothing to add and the
+            layer is optional.
+    """
+    try:
+        payload = build()
+        if not payload or not payload.get("adds"):
+            if required:
+                return {"success": False, "message": f"Failed to Load Project {label} to APEX DB"}
+            return None
+        return AGOLDataLoader(url=url, layer=layer_id).add_features(payload)
+    except Exception as e:
+        return {"success": False, "message": f"{label} payload error: {e}"}
+
+
+def iter_child_uploads(draft: ProjectDraft, globalid: str, url: str = APEX_URL, max_workers: int = 4):
+    """
+    Build and load every child layer of a project concurrently.
+
+    Payload building and applyEdits for each layer run in a bounded thread
+    pool. The builders only read the draft, so the workers need no app context.
+
+    Args:
+        draft (ProjectDraft): The project.
+        globalid (str): The GlobalID of the already loaded project.
+        url (str, optional): The APEX Feature Service URL.
+        max_workers (int, optional): Maximum concurrent child uploads. Defaults to 4.
+
+    Yields:
+        tuple: (name, result) for each child layer in completion order, where
+            name is "geometry", "communities", "contacts" or a geography name and
+            result is the loader result or None if there was nothing to add.
+    """
+    tasks = _child_builders(draft, globalid)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_load_child, url, layer_id, build, required, label): name
+            for name, (layer_id, build, required, label) in tasks.items()
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
@@ -1,34 +1,20 @@
 
 import streamlit as st
-from streamlit_folium import st_folium
 from streamlit_scroll_to_top import scroll_to_here
-import folium
-from folium.plugins import Draw, Geocoder, Search
-import geopandas as gpd
-import tempfile
-import zipfile
-import time
-
-from map import add_small_geocoder
-from shapefile_upload import point_shapefile, polyline_shapefile
-from enter_value_upload import enter_latlng, enter_mileposts
-from draw_upload import draw_point, draw_line
+import os
+
+# Steps 1-3 only need these light modules. The geometry and map stack
+# (shapely, pyproj, pyogrio, folium) and the upload modules are imported
+# inside the step that uses them, so they are only loaded on first use.
 from details_form import project_details_form
-from aashtoware import aashtoware_project, aashtoware_point
+from aashtoware import aashtoware_point
 from contacts import contacts_list
 from instructions import instructions
-from review import review_information
-from district_queries import run_district_queries
-from payloads import project_payload, communities_payload, geometry_payload, contacts_payload, geography_payload
-from agol_util import AGOLDataLoader, format_guid, delete_project
+from reference_cache import reference_refresh_button
 
 
 st.set_page_config(page_title="Alaska DOT&PF - APEX Project Creator", page_icon="📝", layout="centered")
 
-# Base overview map
-m = folium.Map(location=[64.2008, -149.4937], zoom_start=4)
-add_small_geocoder(m)
-
 
 # Initialize session state
 defaults = {
@@ -49,10 +35,17 @@ for key, val in defaults.items():
     if key not in st.session_state:
         st.session_state[key] = val
 
-import streamlit as st
-from streamlit_scroll_to_top import scroll_to_here
-
 TOTAL_STEPS = 6
+
+# Upload mode, set with APEX_UPLOAD_MODE:
+#   atomic   (default) one all-or-nothing applyEdits call, so a failed upload never
+#            leaves a project without its geometry or geographies behind
+#   parallel one applyEdits call per layer, loaded concurrently with per-layer progress
+UPLOAD_MODE = os.environ.get("APEX_UPLOAD_MODE", "atomic").strip().lower()
+if UPLOAD_MODE not in ("atomic", "parallel"):
+    raise ValueError(f"APEX_UPLOAD_MODE must be 'atomic' or 'parallel', not {UPLOAD_MODE!r}")
+ATOMIC_UPLOAD = UPLOAD_MODE == "atomic"
+
 if "step" not in st.session_state:
     st.session_state.step = 1
 
@@ -78,6 +71,11 @@ def prev_step():
 
 
 
+# Reference list refresh (communities, routes, mileposts are cached across sessions)
+with st.sidebar:
+    reference_refresh_button()
+
+
 # Header and progress
 st.title("📝 ADD NEW APEX PROJECT")
 st.markdown("##### COMPLETE STEPS TO ADD A NEW PROJECT TO THE APEX DATABASE")
@@ -159,6 +157,8 @@ elif st.session_state.step == 3:
 
 
 elif st.session_state.step == 4:
+    from district_queries import run_district_queries
+
     st.markdown("### LOAD GEOMETRY 📍")
     st.write(
         "Select the project type and provide its geometry. "
@@ -228,12 +228,15 @@ elif st.session_state.step == 4:
                 aashtoware_point(st.session_state.get("awp_dcml_latitude"), st.session_state.get("awp_dcml_longitude"))
                 st.session_state.selected_route = None
             elif option == "Upload Shapefile":
+                from shapefile_upload import point_shapefile
                 point_shapefile()
                 st.session_state.selected_route = None
             elif option == "Select Point on Map":
+                from draw_upload import draw_point
                 draw_point()
                 st.session_state.selected_route = None
             elif option == "Enter Latitude/Longitude":
+                from enter_value_upload import enter_latlng
                 enter_latlng()
                 st.session_state.selected_route = None
 
@@ -259,12 +262,15 @@ elif st.session_state.step == 4:
             st.session_state.geo_option = option
 
             if option == "Upload Shapefile":
+                from shapefile_upload import polyline_shapefile
                 polyline_shapefile()
                 st.session_state.selected_point = None
             elif option == "Enter Mileposts":
+                from enter_value_upload import enter_mileposts
                 enter_mileposts()
                 st.session_state.selected_point = None
             elif option == "Draw Route on Map":
+                from draw_upload import draw_line
                 draw_line()
                 st.session_state.selected_point = None
 
@@ -315,6 +321,8 @@ elif st.session_state.step == 4:
 
 
 elif st.session_state.step == 5:
+    from review import review_information
+
     st.markdown("### REVIEW & SUBMIT ✔️")
     st.write(
     "Review all submitted project information carefully. "
@@ -334,6 +342,10 @@ elif st.session_state.step == 5:
 
 
 elif st.session_state.step == 6:
+    from payloads import project_payload
+    from apex_core.agol import AGOLDataLoader, format_guid, delete_project
+    from upload import APEX_URL, GEOGRAPHY_LAYERS, upload_project_atomic, iter_child_uploads
+
     st.markdown("### UPLOAD PROJECT🚀")
     st.write(
         "Select your name from the dropdown. If not listed, choose **Other** and enter it in the text box. "
@@ -407,155 +419,96 @@ elif st.session_state.step == 6:
     # --- Upload Button Logic (unchanged) ---
     if st.session_state.get("upload_clicked", False):
 
-        apex_url = "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/service_0d036ae7c0a7424088ee565727d1bb66/FeatureServer"
+        apex_url = APEX_URL
         spinner_container = st.empty()
 
-        # --- Upload Project ---
-        with spinner_container, st.spinner("Loading Project to APEX..."):
-            try:
-                payload_project = project_payload()
-                projects_layer = 0
-                load_project = (
-                    AGOLDataLoader(url=apex_url, layer=projects_layer).add_features(payload_project)
-                    if payload_project
-                    else {"success": False, "message": "Failed to Load Project to APEX DB"}
-                )
-            except Exception as e:
-                load_project = {"success": False, "message": f"Project payload error: {e}"}
-
-        spinner_container.empty()
-
-        if load_project.get("success"):
-            st.session_state["apex_globalid"] = format_guid(load_project["globalids"])
-            st.success("LOAD PROJECT: SUCCESS ✅")
-        else:
-            st.error(f"LOAD PROJECT: FAILURE ❌ {load_project.get('message')}")
-            st.session_state.setdefault("step_failures", []).append(load_project.get("message"))
-
-        # --- Upload Geometry ---
-        with spinner_container, st.spinner("Loading Project Geometry to APEX..."):
-            try:
-                payload_geometry = geometry_payload(st.session_state.get("apex_globalid"))
-
-                if st.session_state.get("selected_point"):
-                    geometry_layer = 1
-                elif st.session_state.get("selected_route"):
-                    geometry_layer = 2
-
-                load_geometry = (
-                    AGOLDataLoader(url=apex_url, layer=geometry_layer).add_features(payload_geometry)
-                    if payload_geometry
-                    else {"success": False, "message": "Failed to Load Project geometry to APEX DB"}
-                )
-            except Exception as e:
-                load_geometry = {"success": False, "message": f"Project Geometry payload error: {e}"}
-
-        spinner_container.empty()
-
-        if load_geometry.get("success"):
-            st.success("LOAD GEOMETRY: SUCCESS ✅")
-        else:
-            st.error(f"LOAD GEOMETRY: FAILURE ❌  {load_geometry.get('message')}")
-            st.session_state.setdefault("step_failures", []).append(load_geometry.get("message"))
+        if ATOMIC_UPLOAD:
+            # --- Upload Project and all child layers in one transaction ---
+            with spinner_container, st.spinner("Loading Project to APEX..."):
+                upload = upload_project_atomic(apex_url)
 
-        # --- Upload Communities ---
-        with spinner_container, st.spinner("Loading Communities to APEX..."):
-            try:
-                payload_communities = communities_payload(st.session_state.get("apex_globalid"))
-                communities_layer = 3
-
-                if payload_communities is None:
-                    load_communities = None
-                else:
-                    load_communities = AGOLDataLoader(
-                        url=apex_url, layer=communities_layer
-                    ).add_features(payload_communities)
+            spinner_container.empty()
 
-            except Exception as e:
-                load_communities = {"success": False, "message": f"Communities payload error: {e}"}
+            layers = upload.get("layers", {})
 
-        spinner_container.empty()
-
-        if load_communities is not None:
-            if load_communities.get("success"):
-                st.success("LOAD COMMUNITIES: SUCCESS ✅")
+            if upload.get("success"):
+                st.session_state["apex_globalid"] = upload["globalid"]
+                st.success("LOAD PROJECT: SUCCESS ✅")
+                st.success("LOAD GEOMETRY: SUCCESS ✅")
+                if "communities" in layers:
+                    st.success("LOAD COMMUNITIES: SUCCESS ✅")
+                if "contacts" in layers:
+                    st.success("LOAD CONTACTS: SUCCESS ✅")
+                st.success("LOAD GEOGRAPHIES: SUCCESS ✅")
             else:
-                st.error(f"LOAD COMMUNITIES: FAILURE ❌  {load_communities.get('message')}")
-                st.session_state.setdefault("step_failures", []).append(load_communities.get("message"))
-
-        # --- Upload Contacts ---
-        with spinner_container, st.spinner("Loading Contacts to APEX..."):
-            try:
-                payload_contacts = contacts_payload(st.session_state.get("apex_globalid"))
-                contacts_layer = 9
-
-                if payload_contacts is None:
-                    load_contacts = None
-                else:
-                    load_contacts = AGOLDataLoader(
-                        url=apex_url, layer=contacts_layer
-                    ).add_features(payload_contacts)
-
-            except Exception as e:
-                load_contacts = {"success": False, "message": f"Contacts payload error: {e}"}
-
-        spinner_container.empty()
+                # rollbackOnFailure means nothing was stored, so there is nothing to clean up
+                failed = [name.upper() for name, result in layers.items() if not result.get("success")]
+                st.error(
+                    f"LOAD PROJECT: FAILURE ❌ {upload.get('message')}"
+                    + (f"\nFailed layers: {', '.join(failed)}" if failed else "")
+                )
+                st.session_state.setdefault("step_failures", []).append(upload.get("message"))
 
-        if load_contacts is not None:
-            if load_contacts.get("success"):
-                st.success("LOAD CONTACTS: SUCCESS ✅")
+        else:
+            # --- Upload Project ---
+            with spinner_container, st.spinner("Loading Project to APEX..."):
+                try:
+                    payload_project = project_payload()
+                    projects_layer = 0
+                    load_project = (
+                        AGOLDataLoader(url=apex_url, layer=projects_layer).add_features(payload_project)
+                        if payload_project
+                        else {"success": False, "message": "Failed to Load Project to APEX DB"}
+                    )
+                except Exception as e:
+                    load_project = {"success": False, "message": f"Project payload error: {e}"}
+
+            spinner_container.empty()
+
+            if load_project.get("success"):
+                st.session_state["apex_globalid"] = format_guid(load_project["globalids"])
+                st.success("LOAD PROJECT: SUCCESS ✅")
             else:
-                st.error(f"LOAD CONTACTS: FAILURE ❌  {load_contacts.get('message')}")
-                st.session_state.setdefault("step_failures", []).append(load_contacts.get("message"))
-
-        # --- Upload Geography ---
-        with spinner_container, st.spinner("Loading Geography to APEX..."):
-            geography_layers = {
-                "region": 4,
-                "borough": 5,
-                "senate": 6,
-                "house": 7
-            }
-
-            if st.session_state['selected_route']:
-                geography_layers["route"] = 8   
-
-            load_results = {}
-
-            try:
-                for name, layer_id in geography_layers.items():
-                    if f"{name}_list" in st.session_state:
-                        
-                        payload = geography_payload(
-                            st.session_state.get("apex_globalid"),
-                            name
-                        )
-
-                        if payload is None:
-                            load_results[name] = None
+                st.error(f"LOAD PROJECT: FAILURE ❌ {load_project.get('message')}")
+                st.session_state.setdefault("step_failures", []).append(load_project.get("message"))
+
+            # --- Upload Geometry, Communities, Contacts and Geography in parallel ---
+            if st.session_state.get("apex_globalid"):
+                geography_names = set(GEOGRAPHY_LAYERS)
+                load_results = {}
+
+                with spinner_container, st.spinner("Loading Project Geometry, Communities, Contacts and Geography to APEX..."):
+                    for name, result in iter_child_uploads(st.session_state["apex_globalid"], apex_url):
+
+                        # Geographies are reported together once they have all finished
+                        if name in geography_names:
+                            load_results[name] = result
+                            continue
+
+                        if result is None:
+                            continue
+                        label = name.upper()
+                        if result.get("success"):
+                            st.success(f"LOAD {label}: SUCCESS ✅")
                         else:
-                            load_results[name] = AGOLDataLoader(
-                                url=apex_url, layer=layer_id
-                            ).add_features(payload)
-
-            except Exception as e:
-                load_results["error"] = {"success": False, "message": f"Geography payload error: {e}"}
+                            st.error(f"LOAD {label}: FAILURE ❌  {result.get('message')}")
+                            st.session_state.setdefault("step_failures", []).append(result.get("message"))
 
-        spinner_container.empty()
+                spinner_container.empty()
 
-        failed_layers = []
-        fail_messages = []
+                failed_layers = []
+                fail_messages = []
 
-        for name, result in load_results.items():
-            if result is not None and not result.get("success", True):
-                failed_layers.append(name.upper())
-                fail_messages.append(result.get("message"))
+                for name, result in load_results.items():
+                    if result is not None and not result.get("success", True):
+                        failed_layers.append(name.upper())
+                        fail_messages.append(result.get("message"))
 
-        if failed_layers:
-            st.error(f"LOAD GEOGRAPHIES: FAILURE ❌\nFailed layers: {', '.join(failed_layers)}\nMessages: {', '.join(fail_messages)}")
-            st.session_state.setdefault("step_failures", []).extend(fail_messages)
-        else:
-            st.success("LOAD GEOGRAPHIES: SUCCESS ✅")
+                if failed_layers:
+                    st.error(f"LOAD GEOGRAPHIES: FAILURE ❌\nFailed layers: {', '.join(failed_layers)}\nMessages: {', '.join(fail_messages)}")
+                    st.session_state.setdefault("step_failures", []).extend(fail_messages)
+                else:
+                    st.success("LOAD GEOGRAPHIES: SUCCESS ✅")
 
 
         # --- Final check ---
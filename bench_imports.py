@@ -0,0 +1,96 @@
+"""
+Cold-start import-time benchmark for the app's per-step modules.
+
+Each group of modules is imported in a fresh interpreter, so the times are
+what a new server process pays the first time a session reaches that step.
+"eager" is the set of imports app.py used to make up front on every cold
+start, for comparison.
+
+    python bench_imports.py [--repeat 5] [--detail]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import os
+
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STEP_MODULES = {
+    "baseline": ["streamlit"],
+    "steps 1-3": ["details_form", "aashtoware", "contacts", "instructions", "reference_cache"],
+    "step 4": ["district_queries", "shapefile_upload", "enter_value_upload", "draw_upload"],
+    "step 5": ["review"],
+    "step 6": ["payloads", "apex_core.agol", "upload"],
+    "eager": [
+        "streamlit_folium", "folium", "folium.plugins", "geopandas", "tempfile", "zipfile", "map",
+        "shapefile_upload", "enter_value_upload", "draw_upload", "details_form", "aashtoware", "contacts",
+        "instructions", "review", "district_queries", "payloads", "apex_core.agol", "reference_cache", "upload",
+    ],
+}
+
+
+def time_import(modules: list, repeat: int) -> float:
+    """
+    Import ``modules`` in ``repeat`` fresh interpreters and return the median time.
+
+    Raises:
+        RuntimeError: If the import fails.
+    """
+    code = (
+        "import time; start = time.perf_counter(); "
+        + "; ".join(f"import {module}" for module in modules)
+        + "; print(time.perf_counter() - start)"
+    )
+    samples = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def slowest_imports(modules: list, limit: int = 10) -> list:
+    """Return the ``limit`` slowest imports (cumulative microseconds, module) from -X importtime."""
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=APP_DIR, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative), module.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time for each app step.")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per group (median is reported)")
+    parser.add_argument("--detail", action="store_true", help="Also list the slowest imports of each group")
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'group':<12}{'median (s)':>12}{'over baseline (s)':>20}")
+    for name, modules in STEP_MODULES.items():
+        try:
+            seconds = time_import(modules, args.repeat)
+        except RuntimeError as e:
+            print(f"{name:<12}{'failed':>12}  {e}")
+            continue
+        if name == "baseline":
+            baseline = seconds
+        extra = f"{seconds - baseline:>20.3f}" if baseline is not None else f"{'':>20}"
+        print(f"{name:<12}{seconds:>12.3f}{extra}")
+
+        if args.detail:
+            for cumulative, module in slowest_imports(modules):
+                print(f"    {cumulative / 1e6:8.3f}s  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,516 @@
+"""
+Bulk loader for many APEX projects at once.
+
+Reads a table of projects with their geometries and loads each one the way the
+app's six steps would, without the UI:
+
+    python bulk_load.py projects.csv [--wkt-column WKT] [--crs EPSG:3338]
+    python bulk_load.py projects.gpkg [--layer stip_2026]
+    python bulk_load.py projects.zip        # or projects.shp
+
+Column names are matched, case-insensitively, to ProjectDraft fields
+(proj_name, phase, tenadd...) or to the APEX attribute names the project
+payload writes (Proj_Name, Phase, TenAdd...). impact_comm_ids takes a
+comma-separated list of DCCED community IDs and contacts a JSON list of
+{"Role", "Name", "Email", "Phone"} objects. Point and MultiPoint rows become
+site projects; LineString and MultiLineString rows become route projects.
+
+Every row is attributed to its districts (from the local geography index, or
+with --remote through concurrent AGOL intersect queries) and its payloads are
+built with apex_core. Projects are then sent in batches of --batch-size,
+each batch as one service-level applyEdits call with rollbackOnFailure. If a
+batch is rejected, its projects are retried one at a time so a single bad
+row doesn't hold back the rest.
+
+Each finished row is appended to the report CSV, and uploaded rows are saved
+to the checkpoint file, so running the same command again after an
+interruption skips everything already loaded. Rows are identified by
+--id-column, or by their 1-based position in the input when it is not given.
+
+AGOL credentials come from the environment, .streamlit/secrets.toml or the
+file given with --credentials (see apex_core.credentials).
+"""
+
+import os
+import csv
+import json
+import time
+import logging
+import argparse
+import datetime
+import threading
+import typing
+from collections import Counter
+from dataclasses import dataclass, fields
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+import shapely
+
+from apex_core.agol import AGOLServiceEditor, configure_credentials, select_records
+from apex_core.credentials import FileCredentials
+from apex_core.districts import attribute_draft, index_configs, sync_geography_index
+from apex_core.draft import ProjectDraft
+from apex_core.geography_index import get_geography_index
+from apex_core.geometry import (
+    to_lonlat, to_latlon_list, to_latlon_paths, merge_lines, from_points, from_paths
+)
+from apex_core.upload import APEX_URL, PROJECTS_LAYER, build_project_edits
+
+
+# ProjectDraft fields filled in by district attribution rather than read from the input
+COMPUTED_FIELDS = {
+    "selected_point", "selected_route", "geography_features", "route_ids", "route_names", "route_list",
+    "region_string", "borough_string", "senate_string", "house_string",
+    "region_list", "borough_list", "senate_list", "house_list",
+}
+INPUT_FIELDS = {f.name: f.type for f in fields(ProjectDraft) if f.name not in COMPUTED_FIELDS}
+
+# APEX project attribute -> ProjectDraft field, for tables exported from APEX or the STIP
+APEX_FIELD_NAMES = {
+    "AWP_Proj_Name": "awp_proj_name",
+    "Proj_Name": "proj_name",
+    "IRIS": "iris",
+    "STIP": "stip",
+    "Fed_Proj_Num": "fed_proj_num",
+    "AWP_Proj_Desc": "awp_proj_desc",
+    "Proj_Desc": "proj_desc",
+    "Proj_Purp": "proj_purp",
+    "Proj_Impact": "proj_impact",
+    "Proj_Prac": "proj_prac",
+    "Phase": "phase",
+    "Fund_Type": "fund_type",
+    "TenAdd": "tenadd",
+    "Award_Date": "award_date",
+    "Award_Fiscal_Year": "award_fiscal_year",
+    "Contractor": "contractor",
+    "Awarded_Amount": "awarded_amount",
+    "Current_Contract_Amount": "current_contract_amount",
+    "Amount_Paid_to_Date": "amount_paid_to_date",
+    "Anticipated_Start": "anticipated_start",
+    "Anticipated_End": "anticipated_end",
+    "Construction_Year": "construction_year",
+    "New_Continuing": "new_continuing",
+    "Impact_Comm": "impact_comm_names",
+    "Proj_Web": "proj_web",
+    "APEX_Mapper_Link": "apex_mapper_link",
+    "Submitted_By": "submitted_by",
+    "Database_Status_Notes": "database_status_notes",
+    "AWP_GUID": "awp_globalid",
+}
+
+REPORT_FIELDS = ["row_id", "status", "globalid", "project_type", "message"]
+
+# shapely geometry type IDs
+POINT_TYPES = {0}          # Point
+LINE_TYPES = {1, 2}        # LineString, LinearRing
+
+logger = logging.getLogger("bulk_load")
+
+
+@dataclass
+class InputRow:
+    """One input row: its ID, raw attribute values and geometry."""
+
+    row_id: str
+    values: dict
+    geometry: object
+
+
+@dataclass
+class PreparedProject:
+    """A project ready to send: its GlobalID and (layer ID, payload) per payload name."""
+
+    row_id: str
+    project_type: str
+    globalid: str
+    named_payloads: dict
+
+
+def read_projects(path: str, layer: str = None, wkt_column: str = "WKT", crs: str = None,
+                  id_column: str = None) -> tuple:
+    """
+    Read the input table.
+
+    Args:
+        path (str): A CSV file with a WKT geometry column, a GeoPackage, a
+            shapefile or a zipped shapefile.
+        layer (str, optional): Layer to read from a multi-layer source.
+        wkt_column (str, optional): Geometry column of a CSV. Defaults to "WKT".
+        crs (str, optional): CRS of the geometries. Required to reproject CSV
+            geometries that aren't WGS84; overrides the CRS of other sources.
+        id_column (str, optional): Column with a unique ID for each row.
+
+    Returns:
+        tuple: (list of InputRow, source CRS or None).
+
+    Raises:
+        ValueError: If a column is missing or row IDs repeat.
+    """
+    if path.lower().endswith(".csv"):
+        frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+        columns = {column.lower(): column for column in frame.columns}
+        if wkt_column.lower() not in columns:
+            raise ValueError(f"CSV has no '{wkt_column}' column. Columns: {', '.join(frame.columns)}")
+        wkt = frame.pop(columns[wkt_column.lower()])
+        geometries = shapely.from_wkt([text if text.strip() else None for text in wkt], on_invalid="warn")
+        source_crs = crs
+    else:
+        from pyogrio import read_dataframe
+        frame = read_dataframe(path, layer=layer)
+        geometries = frame.geometry.to_numpy()
+        source_crs = crs or frame.crs
+        frame = pd.DataFrame(frame.drop(columns=frame.geometry.name))
+
+    records = frame.to_dict("records")
+    if id_column:
+        columns = {column.lower(): column for column in frame.columns}
+        if id_column.lower() not in columns:
+            raise ValueError(f"Input has no '{id_column}' column.")
+        row_ids = [str(record[columns[id_column.lower()]]) for record in records]
+    else:
+        row_ids = [str(number) for number in range(1, len(records) + 1)]
+
+    duplicates = [row_id for row_id, count in Counter(row_ids).items() if count > 1]
+    if duplicates:
+        raise ValueError(f"Row IDs must be unique; repeated: {', '.join(sorted(duplicates)[:10])}")
+
+    rows = [InputRow(row_id, record, geometry) for row_id, record, geometry in zip(row_ids, records, geometries)]
+    return rows, source_crs
+
+
+def _is_missing(value) -> bool:
+    """True for None, blank strings and NaN/NaT."""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    if isinstance(value, (list, dict)):
+        return False
+    return bool(pd.isna(value))
+
+
+def _coerce(value, annotation):
+    """Convert an input value to the type of a ProjectDraft field."""
+    if _is_missing(value):
+        return None
+    kind = next((arg for arg in typing.get_args(annotation) if arg is not type(None)), annotation)
+
+    if kind is datetime.date:
+        if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+            return value
+        return pd.Timestamp(value).date()
+    if kind is int:
+        return int(float(value))
+    if kind is float:
+        return float(value)
+    if kind is list:
+        if isinstance(value, list):
+            return value
+        text = str(value).strip()
+        if text.startswith("["):
+            return json.loads(text)
+        return [item.strip() for item in text.split(",") if item.strip()]
+    if isinstance(value, float) and value.is_integer():
+        # Numeric columns read from a GeoPackage or shapefile
+        value = int(value)
+    return str(value).strip()
+
+
+def _field_for_column(column: str) -> str:
+    """The ProjectDraft field a column maps to, or None."""
+    lowered = column.strip().lower()
+    if lowered in INPUT_FIELDS:
+        return lowered
+    for apex_name, field_name in APEX_FIELD_NAMES.items():
+        if apex_name.lower() == lowered:
+            return field_name
+    return None
+
+
+def _set_geometry(draft: ProjectDraft, geometry, crs):
+    """Store a shapely geometry on the draft as site points or a route."""
+    if geometry is None or shapely.is_empty(geometry):
+        raise ValueError("Row has no geometry")
+
+    parts = shapely.get_parts(geometry)
+    types = set(shapely.get_type_id(parts).tolist())
+    if types <= POINT_TYPES:
+        draft.selected_point = from_points(to_latlon_list(to_lonlat(shapely.get_coordinates(parts), crs)))
+    elif types <= LINE_TYPES:
+        draft.selected_route = from_paths(to_latlon_paths(merge_lines(parts), crs))
+    else:
+        raise ValueError(f"Unsupported geometry type: {geometry.geom_type}")
+
+
+def row_to_draft(row: InputRow, crs=None) -> ProjectDraft:
+    """
+    Build a ProjectDraft from an input row.
+
+    Raises:
+        ValueError: If a value can't be converted or the geometry is missing or unsupported.
+    """
+    draft = ProjectDraft()
+    for column, value in row.values.items():
+        field_name = _field_for_column(column)
+        if field_name is None:
+            continue
+        try:
+            setattr(draft, field_name, _coerce(value, INPUT_FIELDS[field_name]))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Bad value for {column}: {value!r} ({e})")
+    _set_geometry(draft, row.geometry, crs)
+    return draft
+
+
+def prepare_project(row: InputRow, crs=None, use_local_index: bool = True, query_workers: int = 5) -> PreparedProject:
+    """
+    Turn an input row into a project ready to upload: convert it, attribute it
+    to its districts and build every payload.
+    """
+    draft = attribute_draft(row_to_draft(row, crs), use_local_index=use_local_index, max_workers=query_workers)
+    globalid, named_payloads = build_project_edits(draft)
+    return PreparedProject(row.row_id, "Site" if draft.is_site else "Route", globalid, named_payloads)
+
+
+def stored_globalids(globalids: list, url: str = APEX_URL) -> set:
+    """
+    Return which of the given project GlobalIDs exist in the project layer, upper-cased.
+
+    Errors are logged and treated as none stored, so the caller resends.
+    """
+    try:
+        records = select_records(url, PROJECTS_LAYER, "GlobalID", globalids, fields="GlobalID")
+    except Exception as e:
+        logger.warning("Could not check which projects were stored: %s", e)
+        return set()
+    return {globalid.upper() for globalid in records}
+
+
+def upload_batch(projects: list, url: str = APEX_URL) -> list:
+    """
+    Send several projects in one service-level applyEdits transaction.
+
+    If the call fails, the project layer is checked for the batch's GlobalIDs
+    first: a timeout or dropped connection can hide a transaction the server
+    committed, and those projects count as uploaded. The rest (rollbackOnFailure
+    means nothing of theirs was kept) are sent again one at a time.
+
+    Returns:
+        list: (project, success, message) for every project.
+    """
+    layer_payloads = {}
+    for project in projects:
+        for layer_id, payload in project.named_payloads.values():
+            layer_payloads.setdefault(layer_id, {"adds": []})["adds"].extend(payload["adds"])
+
+    result = AGOLServiceEditor(url).add_features(layer_payloads)
+    if result["success"]:
+        return [(project, True, result["message"]) for project in projects]
+
+    stored = stored_globalids([project.globalid for project in projects], url)
+    outcomes = [(project, True, "Already in APEX") for project in projects if project.globalid.upper() in stored]
+    remaining = [project for project in projects if project.globalid.upper() not in stored]
+    if len(projects) == 1:
+        return outcomes or [(projects[0], False, result["message"])]
+
+    if remaining:
+        logger.warning("Batch of %d projects failed (%s); retrying %d one at a time",
+                       len(projects), result["message"], len(remaining))
+    return outcomes + [outcome for project in remaining for outcome in upload_batch([project], url)]
+
+
+class BulkReport:
+    """
+    Thread-safe per-row report and resume checkpoint.
+
+    The report CSV is appended to, so resumed runs add to it. The checkpoint
+    is a JSON file of uploaded row ID -> project GlobalID, rewritten
+    atomically after every batch.
+
+    Args:
+        report_path (str): Report CSV path.
+        checkpoint_path (str): Checkpoint JSON path.
+        source (str): The input path, recorded so a checkpoint isn't resumed against another input.
+
+    Raises:
+        ValueError: If the checkpoint was written for a different input.
+    """
+
+    def __init__(self, report_path: str, checkpoint_path: str, source: str):
+        self.report_path = report_path
+        self.checkpoint_path = checkpoint_path
+        self.source = os.path.abspath(source)
+        self.counts = {}
+        self._lock = threading.Lock()
+
+        self.done = {}
+        if os.path.isfile(checkpoint_path):
+            with open(checkpoint_path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+            if checkpoint.get("source") != self.source:
+                raise ValueError(
+                    f"Checkpoint {checkpoint_path} belongs to {checkpoint.get('source')}; "
+                    "use another --checkpoint for this input."
+                )
+            self.done = checkpoint.get("done", {})
+
+        new_report = not os.path.isfile(report_path) or os.path.getsize(report_path) == 0
+        self._report = open(report_path, "a", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._report, fieldnames=REPORT_FIELDS)
+        if new_report:
+            self._writer.writeheader()
+
+    def _save_checkpoint(self):
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"source": self.source, "done": self.done}, f, indent=1)
+        os.replace(tmp, self.checkpoint_path)
+
+    def record(self, rows: list):
+        """
+        Record finished rows.
+
+        Args:
+            rows (list): (row_id, status, globalid, project_type, message) tuples.
+                Rows with status "uploaded" are added to the checkpoint.
+        """
+        with self._lock:
+            uploaded = False
+            for row_id, status, globalid, project_type, message in rows:
+                self._writer.writerow({
+                    "row_id": row_id, "status": status, "globalid": globalid or "",
+                    "project_type": project_type or "", "message": message or "",
+                })
+                self.counts[status] = self.counts.get(status, 0) + 1
+                if status == "uploaded":
+                    self.done[row_id] = globalid
+                    uploaded = True
+            self._report.flush()
+            if uploaded:
+                self._save_checkpoint()
+
+    def close(self):
+        self._report.close()
+
+
+def run(rows: list, crs, report: BulkReport, url: str = APEX_URL, use_local_index: bool = True,
+        batch_size: int = 20, workers: int = 4, upload_workers: int = 2, query_workers: int = 5,
+        dry_run: bool = False) -> dict:
+    """
+    Prepare and upload every row that isn't in the checkpoint yet.
+
+    Rows are prepared in a pool of ``workers`` threads; as they finish they
+    are grouped into batches of ``batch_size`` projects and sent by a pool of
+    ``upload_workers`` threads, so uploading overlaps with preparing the
+    remaining rows.
+
+    Returns:
+        dict: Number of rows per report status ("uploaded", "failed", "built").
+    """
+    pending = [row for row in rows if row.row_id not in report.done]
+    if len(pending) < len(rows):
+        logger.info("Skipping %d row(s) already uploaded according to the checkpoint", len(rows) - len(pending))
+    if not pending:
+        return report.counts
+
+    def send(batch):
+        report.record([
+            (project.row_id, "uploaded" if success else "failed", project.globalid if success else None,
+             project.project_type, message)
+            for project, success, message in upload_batch(batch, url)
+        ])
+
+    with ThreadPoolExecutor(max_workers=workers) as prepare_pool, \
+            ThreadPoolExecutor(max_workers=upload_workers) as upload_pool:
+        futures = {
+            prepare_pool.submit(prepare_project, row, crs, use_local_index, query_workers): row
+            for row in pending
+        }
+        batch, uploads = [], []
+        for done, future in enumerate(as_completed(futures), start=1):
+            row = futures[future]
+            try:
+                project = future.result()
+            except Exception as e:
+                report.record([(row.row_id, "failed", None, None, f"Prepare error: {e}")])
+                continue
+
+            if dry_run:
+                layers = ", ".join(
+                    f"{name} ({len(payload['adds'])})" for name, (_, payload) in project.named_payloads.items()
+                )
+                report.record([(row.row_id, "built", None, project.project_type, layers)])
+                continue
+
+            batch.append(project)
+            if len(batch) >= batch_size:
+                uploads.append(upload_pool.submit(send, batch))
+                batch = []
+            if done % 50 == 0:
+                logger.info("Prepared %d/%d rows", done, len(pending))
+
+        if batch:
+            uploads.append(upload_pool.submit(send, batch))
+        for upload in uploads:
+            upload.result()
+
+    return report.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load many projects into APEX from a CSV, GeoPackage or shapefile.")
+    parser.add_argument("input", help="CSV with a WKT column, GeoPackage, shapefile or zipped shapefile")
+    parser.add_argument("--layer", help="Layer to read from a GeoPackage")
+    parser.add_argument("--wkt-column", default="WKT", help="Geometry column of a CSV (default: WKT)")
+    parser.add_argument("--crs", help="CRS of the input geometries, e.g. EPSG:3338 (default: the file's own, or WGS84 for CSV)")
+    parser.add_argument("--id-column", help="Column with a unique row ID, used by the report and checkpoint")
+    parser.add_argument("--report", help="Report CSV (default: <input>_report.csv)")
+    parser.add_argument("--checkpoint", help="Checkpoint JSON (default: <input>_checkpoint.json)")
+    parser.add_argument("--url", default=APEX_URL, help="APEX Feature Service URL")
+    parser.add_argument("--credentials", help="TOML or JSON file with AGOL_USERNAME and AGOL_PASSWORD")
+    parser.add_argument("--remote", action="store_true", help="Attribute districts with AGOL queries instead of the local index")
+    parser.add_argument("--batch-size", type=int, default=20, help="Projects per applyEdits call (default: 20)")
+    parser.add_argument("--workers", type=int, default=4, help="Rows prepared concurrently (default: 4)")
+    parser.add_argument("--upload-workers", type=int, default=2, help="Concurrent applyEdits calls (default: 2)")
+    parser.add_argument("--query-workers", type=int, default=5, help="Concurrent intersect queries per row (default: 5)")
+    parser.add_argument("--dry-run", action="store_true", help="Build the payloads and report them without uploading")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.credentials:
+        configure_credentials(FileCredentials(args.credentials))
+
+    stem = os.path.splitext(args.input)[0]
+    report_path = args.report or f"{stem}_report.csv"
+    checkpoint_path = args.checkpoint or f"{stem}_checkpoint.json"
+
+    rows, crs = read_projects(args.input, args.layer, args.wkt_column, args.crs, args.id_column)
+    logger.info("Read %d row(s) from %s", len(rows), args.input)
+
+    # A batch job can wait for the snapshot instead of querying AGOL until a background build finishes
+    if not args.remote and get_geography_index(index_configs(), build=False) is None:
+        logger.info("Building the geography index snapshot")
+        try:
+            sync_geography_index()
+        except Exception as e:
+            logger.warning("Geography index unavailable, using AGOL queries: %s", e)
+
+    report = BulkReport(report_path, checkpoint_path, args.input)
+    start = time.perf_counter()
+    try:
+        counts = run(
+            rows, crs, report, url=args.url, use_local_index=not args.remote, batch_size=max(1, args.batch_size),
+            workers=max(1, args.workers), upload_workers=max(1, args.upload_workers),
+            query_workers=max(1, args.query_workers), dry_run=args.dry_run
+        )
+    finally:
+        report.close()
+
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items())) or "nothing to do"
+    logger.info("Finished in %.1fs: %s. Report: %s", time.perf_counter() - start, summary, report_path)
+    if counts.get("failed"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 
 import streamlit as st
 import datetime
-from agol_util import get_multiple_fields
+from reference_cache import cached_multiple_fields
 from aashtoware import aashtoware_project
 
 # --- Widget key helper ---
@@ -71,7 +71,7 @@ def impacted_comms_select(is_awp: bool = False):
         "All_Alaska_Communities_Baker/FeatureServer"
     )
     # Expected shape: [{"OverallName": "...", "DCCED_CommunityId": "..."}]
-    comms_list = get_multiple_fields(comms_url, 7, ["OverallName", "DCCED_CommunityId"]) or []
+    comms_list = cached_multiple_fields(comms_url, 7, ["OverallName", "DCCED_CommunityId"]) or []
 
     # Mappings
     name_to_id = {
@@ -1,14 +1,42 @@
 import streamlit as st
-import json
-import requests
-from agol_util import AGOLQueryIntersect
+from apex_core.districts import attribute_geometry, features_by_id, query_shape
+from apex_core.geometry import geometry_hash
 
-def run_district_queries():
+
+def project_geometry_hash() -> str:
+    """Hash of the current project geometry (site points or route)."""
+    return geometry_hash(st.session_state.get('selected_point') or st.session_state.get('selected_route'))
+
+
+def _store_result(name: str, result):
+    """Write one geography's intersect results into session_state."""
+    st.session_state['geography_features']["layers"][name] = features_by_id(name, result)
+
+    if name == "route":
+        st.session_state['route_list'] = result.list_values
+        st.session_state['route_ids'] = ",".join(result.list_values) or ""
+        st.session_state['route_names'] = result.string_values or ""
+    else:
+        st.session_state[f'{name}_list'] = result.list_values or []
+        st.session_state[f'{name}_string'] = result.string_values or ""
+
+
+def run_district_queries(max_workers: int = 5, use_local_index: bool = True):
     """
     Decide which geometry to use from session_state and run
     intersect queries for House, Senate, Borough, and Region.
     Store string_values and list_values into session_state.
     Defaults are blank if nothing is returned.
+
+    The queries themselves run in apex_core.districts.attribute_geometry():
+    polygon geographies come from the local geography index when
+    ``use_local_index`` is set and the index is fresh, the rest are sent to
+    AGOL concurrently in a pool of ``max_workers`` threads. Results are written
+    to session_state on the script thread as each one completes.
+
+    The matching features, with generalized geometry, are kept in
+    session_state['geography_features'] under a hash of the project geometry
+    so the step 6 geography payloads can reuse them.
     """
 
     # Decide which geometry to use
@@ -30,6 +58,7 @@ def run_district_queries():
     st.session_state['region_string'] = ""
     st.session_state['route_id'] = ""
     st.session_state['route_name'] = ""
+    st.session_state['geography_features'] = {"geometry_hash": project_geometry_hash(), "layers": {}}
 
     # Only run queries if we have a geometry
     if st.session_state['project_geometry'] is not None:
@@ -38,73 +67,19 @@ def run_district_queries():
         info_placeholder = st.empty()
         info_placeholder.info("Querying against geography layers...")
 
-        # House Districts
-        house = AGOLQueryIntersect(
-            url="https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/STIP_HouseDistricts/FeatureServer",
-            layer=0,
-            geometry=st.session_state['project_geometry'],
-            fields="GlobalID,DISTRICT",
-            return_geometry=False,
-            list_values="GlobalID",
-            string_values="DISTRICT"
-        )
-        st.session_state['house_list'] = house.list_values or []
-        st.session_state['house_string'] = house.string_values or ""
-
-        # Senate Districts
-        senate = AGOLQueryIntersect(
-            url="https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/STIP_SenateDistricts/FeatureServer",
-            layer=0,
-            geometry=st.session_state['project_geometry'],
-            fields="GlobalID,DISTRICT",
-            return_geometry=False,
-            list_values="GlobalID",
-            string_values="DISTRICT"
-        )
-        st.session_state['senate_list'] = senate.list_values or []
-        st.session_state['senate_string'] = senate.string_values or ""
-
-        # Boroughs
-        borough = AGOLQueryIntersect(
-            url="https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/STIP_BoroughCensus/FeatureServer",
-            layer=0,
-            geometry=st.session_state['project_geometry'],
-            fields="GlobalID,NameAlt",
-            return_geometry=False,
-            list_values="GlobalID",
-            string_values="NameAlt"
-        )
-        st.session_state['borough_list'] = borough.list_values or []
-        st.session_state['borough_string'] = borough.string_values or ""
-
-        # Regions
-        region = AGOLQueryIntersect(
-            url="https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/STIP_DOT_PF_Regions/FeatureServer",
-            layer=0,
-            geometry=st.session_state['project_geometry'],
-            fields="GlobalID,NameAlt",
-            return_geometry=False,
-            list_values="GlobalID",
-            string_values="NameAlt"
+        def on_result(name, result, done, total):
+            _store_result(name, result)
+            info_placeholder.info(f"Querying against geography layers... ({done}/{total})")
+
+        # Site points or (multipart) route as one lon/lat shapely geometry.
+        # If Routes, Intersect Route Layer as well
+        attribute_geometry(
+            query_shape(st.session_state.get('selected_point'), st.session_state.get('selected_route')),
+            include_route=bool(st.session_state.get('selected_route')),
+            use_local_index=use_local_index,
+            max_workers=max_workers,
+            on_result=on_result
         )
-        st.session_state['region_list'] = region.list_values or []
-        st.session_state['region_string'] = region.string_values or ""
-
-
-        # If Routes, Intersect Route Layer
-        if st.session_state['selected_route']:
-            route = AGOLQueryIntersect(
-                url="https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/AKDOT_Routes_Mileposts/FeatureServer",
-                layer=0,
-                geometry=st.session_state['project_geometry'],
-                fields="Route_ID,Route_Name_Unique",
-                return_geometry=False,
-                list_values="Route_ID",
-                string_values="Route_Name_Unique"
-            )
-            st.session_state['route_list'] = route.list_values
-            st.session_state['route_ids'] = ",".join(route.list_values) or ""
-            st.session_state['route_names'] = route.string_values or ""
 
         # Clear the info message once complete
-        info_placeholder.empty()
\ No newline at end of file
+        info_placeholder.empty()
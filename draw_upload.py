@@ -3,13 +3,18 @@ Streamlit functions for drawing points and lines on a Folium map.
 
 Users can interactively draw geometries, which are then stored
 in Streamlit session state and displayed with success messages.
+
+Each drawing map runs in its own st.fragment and only returns its drawings,
+so panning, zooming and drawing rerun just the map. The whole app reruns
+only when the saved geometry actually changes.
 """
 
 import streamlit as st
 from streamlit_folium import st_folium
 import folium
-from folium.plugins import Draw, Geocoder
-from map import add_small_geocoder, set_bounds_route, set_zoom
+from folium.plugins import Draw
+from apex_core.geometry import to_latlon_list, as_points
+from map import add_small_geocoder, set_bounds_route, set_zoom, display_route
 
 
 
@@ -28,6 +33,13 @@ def draw_point():
     st.markdown("<h5>Drop Point on a Map</h5>", unsafe_allow_html=True)
     st.write( "Use the map to drop a pin for your project location. Select the pin icon on the left, " "then click on the map to place it. You can zoom or search for a location using the " "search bar in the top-right corner.  If you need to override a previously saved point, drop the new point onto the map and the old one will be overwritten"  )
 
+    _point_draw_map()
+
+
+@st.fragment
+def _point_draw_map():
+    """The point drawing map, rerun on its own when the drawings change."""
+
     # Create map centered on Alaska
     m = folium.Map(location=[64.0000, -152.0000], zoom_start=4)
 
@@ -36,9 +48,10 @@ def draw_point():
 
     # ✅ Add stored point with the DEFAULT Leaflet icon (no custom icon specified)
     if st.session_state.get("selected_point"):
-        lat, lon = st.session_state["selected_point"]
-        folium.Marker(location=[lat, lon]).add_to(drawn_items)
-        m.fit_bounds([[lat, lon]])
+        points = as_points(st.session_state["selected_point"])
+        for lat, lon in points:
+            folium.Marker(location=[lat, lon]).add_to(drawn_items)
+        m.fit_bounds(points)
 
     # Add Draw control (no feature_group argument in folium>=0.17)
     draw = Draw(
@@ -61,14 +74,18 @@ def draw_point():
     add_small_geocoder(m)
 
     # Render map in Streamlit
-    output = st_folium(m, width=700, height=500, key="point_draw_map")
+    output = st_folium(m, width=700, height=500, key="point_draw_map", returned_objects=["all_drawings"])
 
     # If a point was drawn or edited, save coordinates
     if output and "all_drawings" in output and output["all_drawings"]:
         points = [f for f in output["all_drawings"] if f.get("geometry", {}).get("type") == "Point"]
         if points:
-            lon, lat = points[-1]["geometry"]["coordinates"]  # [lon, lat]
-            st.session_state["selected_point"] = [round(lat, 6), round(lon, 6)]
+            coords = points[-1]["geometry"]["coordinates"]  # [lon, lat]
+            point = to_latlon_list(coords)[0]
+            # Rerun the whole app (district lookup, navigation) only for a new point
+            if point != st.session_state.get("selected_point"):
+                st.session_state["selected_point"] = point
+                st.rerun()
 
 
 
@@ -91,6 +108,12 @@ def draw_line():
         "using the search bar in the top-right corner.  If you need to create a new route, draw the new route on the map and it will overwrite the old one."
     )
 
+    _line_draw_map()
+
+
+@st.fragment
+def _line_draw_map():
+    """The route drawing map, rerun on its own when the drawings change."""
 
     # Create map centered on Alaska
     m = folium.Map(location=[64.2008, -149.4937], zoom_start=4)
@@ -100,7 +123,7 @@ def draw_line():
 
     # Restore previously saved route if present
     if st.session_state.get("selected_route"):
-        route = st.session_state["selected_route"]
+        route = display_route(st.session_state["selected_route"], report=False)
         bounds = set_bounds_route(route)
         folium.PolyLine(route).add_to(drawn_items)
 
@@ -135,7 +158,7 @@ def draw_line():
     add_small_geocoder(m)
 
     # Render map in Streamlit
-    output = st_folium(m, width=700, height=500, key="line_draw_map")
+    output = st_folium(m, width=700, height=500, key="line_draw_map", returned_objects=["all_drawings"])
 
     # If a line was drawn, save coordinates
     if output and "all_drawings" in output and output["all_drawings"]:
@@ -144,6 +167,9 @@ def draw_line():
         if lines:
             coords = lines[-1]["geometry"]["coordinates"]  # list of [lon, lat]
             # ✅ Reformat to [lat, lon] pairs, rounded
-            formatted = [[round(lat, 6), round(lon, 6)] for lon, lat in coords]
-            st.session_state["selected_route"] = formatted
+            route = to_latlon_list(coords)
+            # Rerun the whole app (district lookup, navigation) only for a new route
+            if route != st.session_state.get("selected_route"):
+                st.session_state["selected_route"] = route
+                st.rerun()
 
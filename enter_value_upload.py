@@ -1,8 +1,9 @@
 import streamlit as st
-from streamlit_folium import st_folium
-import folium
-from map import add_small_geocoder, add_bottom_message
-from agol_util import get_unique_field_values
+from map import display_route, show_point_map, show_route_map
+from apex_core.geometry import as_points
+from apex_core.agol import sql_literal
+from lrs import get_route_geometry, get_route_store
+from reference_cache import cached_unique_field_values
 
 
 def enter_latlng():
@@ -12,7 +13,7 @@ def enter_latlng():
     # If a point already exists, use it as default values
     existing_point = st.session_state.get("selected_point")
     if existing_point:
-        default_lat, default_lon = existing_point
+        default_lat, default_lon = as_points(existing_point)[0]
     else:
         default_lat, default_lon = 0.0, 0.0
 
@@ -42,12 +43,7 @@ def enter_latlng():
             st.write("")
             st.markdown("<h5>Review Mapped Point</h5>", unsafe_allow_html=True)
 
-            m = folium.Map(location=[lat, lon], zoom_start=12)
-            folium.Marker([lat, lon], icon=folium.Icon(color="blue"), tooltip="Uploaded Point").add_to(m)
-
-            add_small_geocoder(m)
-
-            st_folium(m, width=700, height=500)
+            show_point_map([[lat, lon]])
 
         except ValueError:
             st.error("Please enter valid numeric values for latitude and longitude.")
@@ -60,14 +56,20 @@ def enter_mileposts():
     # Milepost AGOL Layer
     mileposts = 'https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/AKDOT_Routes_Mileposts/FeatureServer'
 
+    # Synced route store (None until `python lrs.py sync` has been run)
+    store = get_route_store()
+
     # Grab List of Route Names
-    route_names = get_unique_field_values(
-        url=mileposts,
-        layer=1,
-        field="Route_Name_Unique",
-        sort_type='alpha',
-        sort_order='asc'
-    )
+    if store:
+        route_names = store.route_names
+    else:
+        route_names = cached_unique_field_values(
+            url=mileposts,
+            layer=1,
+            field="Route_Name_Unique",
+            sort_type='alpha',
+            sort_order='asc'
+        )
 
     # Create dropdown list for route selection (no default selected)
     route_name = st.selectbox("Route Name", route_names, index=None, placeholder="Select a route")
@@ -76,14 +78,17 @@ def enter_mileposts():
         st.info("Please select a route before milepost options are available.")
     else:
         # Get milepost values for the selected route
-        milepost_values = get_unique_field_values(
-            url=mileposts,
-            layer=1,
-            field="Milepost_Number",
-            where=f"Route_Name_Unique='{route_name}'",
-            sort_type='numeric',
-            sort_order='asc'
-        )
+        if store:
+            milepost_values = store.milepost_numbers(route_name)
+        else:
+            milepost_values = cached_unique_field_values(
+                url=mileposts,
+                layer=1,
+                field="Milepost_Number",
+                where=f"Route_Name_Unique={sql_literal(route_name)}",
+                sort_type='numeric',
+                sort_order='asc'
+            )
 
         # Dropdowns for start and end mileposts (no default selected)
         col1, col2 = st.columns(2)
@@ -94,5 +99,21 @@ def enter_mileposts():
             end = st.selectbox("End Milepost", milepost_values, index=None, placeholder="Select End MP")
 
         if start is not None and end is not None:
+            if start == end:
+                # Don't leave a segment from an earlier selection behind
+                st.session_state.selected_route = None
+                st.warning("Start and end mileposts must be different.")
+                return
+
+            try:
+                # Route geometry is cached, so only the first lookup of a route hits AGOL
+                route = get_route_geometry(route_name)
+                st.session_state.selected_route = route.segment(start, end)
+            except Exception as e:
+                st.session_state.selected_route = None
+                st.error(f"Could not build route between mileposts: {e}")
+                return
+
             st.write('')
-            st.write(f"MAP WITH LRS LINEAR ROUTE WILL APPEAR BELOW")
\ No newline at end of file
+            st.markdown("<h5>Review Mapped Route</h5>", unsafe_allow_html=True)
+            show_route_map(display_route(st.session_state.selected_route))
\ No newline at end of file
@@ -0,0 +1,500 @@
+"""
+Linear referencing for AKDOT&PF routes.
+
+Each route's polyline from AKDOT_Routes_Mileposts layer 0 is cached as NumPy
+arrays of vertices and cumulative measures. Milepost points from layer 1 are
+projected onto the line once to find their measures. A start/end milepost
+pair is then turned into a sub-segment with vectorized interpolation,
+without another request to AGOL.
+
+For all routes at once, a compact on-disk store can be built with
+
+    python lrs.py sync [--store-dir DIR]
+
+It writes flat float64 coordinate, measure and milepost arrays plus a JSON
+offsets index. Every Streamlit session opens the store read-only with
+numpy.memmap, so all workers share one page-cached copy and a route lookup
+is an O(1) slice. Routes fall back to AGOL when no store has been built.
+"""
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import logging
+import argparse
+import threading
+from collections import defaultdict
+import numpy as np
+import shapely
+from apex_core.agol import iter_query_features, sql_literal
+from apex_core.geometry import from_paths
+
+
+MILEPOSTS_URL = "https://services.arcgis.com/r4A0V7UzH9fcLVvv/arcgis/rest/services/AKDOT_Routes_Mileposts/FeatureServer"
+ROUTES_LAYER = 0
+MILEPOSTS_LAYER = 1
+ROUTE_NAME_FIELD = "Route_Name_Unique"
+MILEPOST_FIELD = "Milepost_Number"
+
+ROUTE_ID_FIELD = "Route_ID"
+
+EARTH_RADIUS_MILES = 3958.8
+
+ROUTE_STORE_DIR = os.environ.get("APEX_ROUTE_STORE", os.path.join(".cache", "route_store"))
+# Bumped whenever the store layout changes; older generations are ignored until the next sync
+ROUTE_STORE_VERSION = 2
+
+logger = logging.getLogger("lrs")
+
+
+def cumulative_miles(coords: np.ndarray) -> np.ndarray:
+    """Cumulative great-circle distance in miles along an (N, 2) array of lon/lat vertices."""
+    lon, lat = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    dlon, dlat = np.diff(lon), np.diff(lat)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    steps = 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+    return np.concatenate(([0.0], np.cumsum(steps)))
+
+
+def locate_points(coords: np.ndarray, measures: np.ndarray, points: np.ndarray, offsets=None) -> np.ndarray:
+    """
+    Project points onto a polyline and return their measures.
+
+    Points are tested against every segment at once with NumPy broadcasting.
+    Longitudes are scaled by cos(latitude) so distances are roughly isotropic.
+
+    Args:
+        coords (np.ndarray): (N, 2) lon/lat vertices.
+        measures (np.ndarray): (N,) measure at each vertex.
+        points (np.ndarray): (P, 2) lon/lat points.
+        offsets (optional): Start index of each part plus N, for a multipart
+            route. The gaps between parts are never matched.
+
+    Returns:
+        np.ndarray: (P,) measure of the nearest location on the line for each point.
+    """
+    scale = np.array([np.cos(np.radians(coords[:, 1].mean())), 1.0])
+    a = (coords[:-1] * scale)[None, :, :]
+    ab = (coords[1:] * scale)[None, :, :] - a
+    length_sq = np.einsum("...i,...i", ab, ab)
+    length_sq = np.where(length_sq == 0, 1, length_sq)
+    # Segments joining the last vertex of one part to the first of the next
+    gaps = np.asarray(offsets[1:-1], dtype=int) - 1 if offsets is not None else np.empty(0, dtype=int)
+
+    # Bound the (points x segments) temporaries to a few million elements
+    chunk = max(1, 2_000_000 // len(coords))
+    located = np.empty(len(points))
+    for i in range(0, len(points), chunk):
+        p = (points[i:i + chunk] * scale)[:, None, :]
+        t = np.clip(np.einsum("...i,...i", p - a, ab) / length_sq, 0, 1)
+        offset = p - (a + t[..., None] * ab)
+        distance = np.einsum("...i,...i", offset, offset)
+        distance[:, gaps] = np.inf
+        segment = np.argmin(distance, axis=1)
+        t_best = t[np.arange(len(segment)), segment]
+        located[i:i + chunk] = measures[segment] + t_best * (measures[segment + 1] - measures[segment])
+    return located
+
+
+class RouteGeometry:
+    """
+    A route polyline with cumulative measures and milepost locations.
+
+    A multipart route keeps its parts back to back in ``coords``; ``offsets``
+    marks where each part starts. Parts are in measure order and measures
+    only ever interpolate inside one part, so the gaps between parts are
+    never drawn or measured.
+
+    Args:
+        coords (np.ndarray): (N, 2) lon/lat vertices in route order.
+        measures (np.ndarray): (N,) measure at each vertex, non-decreasing within each part.
+        mileposts (dict): Milepost number -> measure along the route.
+        offsets (optional): Start index of each part followed by N. Defaults to one part.
+    """
+
+    def __init__(self, coords: np.ndarray, measures: np.ndarray, mileposts: dict, offsets=None):
+        self.coords = coords
+        self.measures = measures
+        self.mileposts = mileposts
+        self.offsets = np.asarray(offsets if offsets is not None else [0, len(coords)], dtype=int)
+
+    def parts(self):
+        """Yield (coords, measures) for each part."""
+        for start, stop in zip(self.offsets[:-1], self.offsets[1:]):
+            yield self.coords[start:stop], self.measures[start:stop]
+
+    def measure_at(self, milepost) -> float:
+        """
+        Return the measure for a milepost.
+
+        Raises:
+            ValueError: If the milepost was not located on the route.
+        """
+        measure = self.mileposts.get(float(milepost))
+        if measure is None:
+            raise ValueError(f"Milepost {milepost} is not located on this route.")
+        return measure
+
+    def segment(self, start, end) -> list:
+        """
+        Extract the part of the route between two mileposts.
+
+        Args:
+            start: Start milepost number.
+            end: End milepost number. If it is lower than ``start``, the
+                segment is returned in reverse order.
+
+        Returns:
+            list: The segment in selected_route form, [lat, lon] pairs rounded to
+                6 decimals: one path, or a list of paths when the mileposts span
+                a gap between route parts.
+
+        Raises:
+            ValueError: If a milepost isn't on the route or no geometry lies between them.
+        """
+        start_m, end_m = self.measure_at(start), self.measure_at(end)
+        low, high = sorted((start_m, end_m))
+
+        pieces = []
+        for coords, measures in self.parts():
+            part_low, part_high = max(low, measures[0]), min(high, measures[-1])
+            if part_high <= part_low:
+                continue
+            inside = (measures > part_low) & (measures < part_high)
+            ends = np.column_stack([
+                np.interp([part_low, part_high], measures, coords[:, 0]),
+                np.interp([part_low, part_high], measures, coords[:, 1]),
+            ])
+            piece = np.vstack([ends[:1], coords[inside], ends[1:]])
+            if pieces and np.allclose(pieces[-1][-1], piece[0]):
+                # Consecutive parts that meet end to start form one path
+                pieces[-1] = np.vstack([pieces[-1], piece[1:]])
+            else:
+                pieces.append(piece)
+
+        if not pieces:
+            raise ValueError(f"No route geometry between mileposts {start} and {end}.")
+        if start_m > end_m:
+            pieces = [piece[::-1] for piece in pieces[::-1]]
+        return from_paths([np.round(piece[:, ::-1], 6).tolist() for piece in pieces])
+
+
+def _chain_paths(paths: list) -> list:
+    """
+    Order and orient paths without M values end to end.
+
+    Starting from the first path, the next one is always the remaining path
+    with an endpoint nearest to the current end, reversed if needed.
+    """
+    remaining = list(paths)
+    chain = [remaining.pop(0)]
+    while remaining:
+        end = chain[-1][-1]
+        starts = np.array([path[0] for path in remaining])
+        ends = np.array([path[-1] for path in remaining])
+        to_start = np.hypot(*(starts - end).T)
+        to_end = np.hypot(*(ends - end).T)
+        nearest = int(np.argmin(np.minimum(to_start, to_end)))
+        path = remaining.pop(nearest)
+        chain.append(path if to_start[nearest] <= to_end[nearest] else path[::-1])
+    return chain
+
+
+def route_arrays(parts: list) -> tuple:
+    """
+    Turn a route's paths into vertex and measure arrays, one part at a time.
+
+    With M values every path is oriented by increasing measure and the paths
+    are sorted by their first measure. Without them, touching paths are merged
+    with shapely's line_merge, the merged parts are chained by their nearest
+    endpoints and measured by cumulative distance in miles; each part starts
+    at the measure where the previous one ended, so the gaps add no distance.
+    Parts are never connected to each other.
+
+    Args:
+        parts (list): Paths as lists of [x, y] or [x, y, m] vertices.
+
+    Returns:
+        tuple: (coords, measures, offsets): contiguous float64 arrays of shape
+            (N, 2) and (N,), and the start index of each part followed by N.
+    """
+    paths = [np.asarray(path, dtype=float) for path in parts if len(path) >= 2]
+    if not paths:
+        raise ValueError("Route has no paths with at least two vertices.")
+
+    if all(path.shape[1] >= 3 and not np.isnan(path[:, 2]).any() for path in paths):
+        pieces = []
+        for path in paths:
+            coords, measures = path[:, :2], path[:, 2]
+            # Keep the vertices in increasing measure order for interpolation
+            if measures[-1] < measures[0]:
+                coords, measures = coords[::-1], measures[::-1]
+            pieces.append((coords, np.maximum.accumulate(measures)))
+        pieces.sort(key=lambda piece: piece[1][0])
+    else:
+        merged = shapely.line_merge(shapely.multilinestrings([shapely.linestrings(path[:, :2]) for path in paths]))
+        chained = _chain_paths([shapely.get_coordinates(part) for part in shapely.get_parts(merged)])
+        pieces, start = [], 0.0
+        for coords in chained:
+            measures = cumulative_miles(coords) + start
+            start = measures[-1]
+            pieces.append((coords, measures))
+
+    offsets = np.cumsum([0] + [len(coords) for coords, _ in pieces])
+    coords = np.ascontiguousarray(np.vstack([coords for coords, _ in pieces]), dtype=float)
+    measures = np.ascontiguousarray(np.concatenate([measures for _, measures in pieces]), dtype=float)
+    return coords, measures, offsets
+
+
+def milepost_measures(coords: np.ndarray, measures: np.ndarray, numbers: list, points: list,
+                      offsets=None) -> dict:
+    """Return milepost number -> measure for milepost points located on a route."""
+    if not points or len(coords) < 2:
+        return {}
+    located = locate_points(coords, measures, np.asarray(points, dtype=float), offsets)
+    return dict(zip(numbers, located.tolist()))
+
+
+def load_route_geometry(route_name: str) -> RouteGeometry:
+    """
+    Download a route's polyline and milepost points and build its RouteGeometry.
+    """
+    where = f"{ROUTE_NAME_FIELD}={sql_literal(route_name)}"
+
+    parts = []
+    for feature in iter_query_features(
+        MILEPOSTS_URL, ROUTES_LAYER, where=where, out_fields=ROUTE_NAME_FIELD,
+        return_geometry=True, extra_params={"returnM": "true"}
+    ):
+        parts.extend(feature.get("geometry", {}).get("paths", []))
+    if not parts:
+        raise ValueError(f"Route '{route_name}' was not found.")
+
+    coords, measures, offsets = route_arrays(parts)
+
+    numbers, points = [], []
+    for feature in iter_query_features(
+        MILEPOSTS_URL, MILEPOSTS_LAYER, where=where, out_fields=MILEPOST_FIELD, return_geometry=True
+    ):
+        geometry = feature.get("geometry", {})
+        number = feature.get("attributes", {}).get(MILEPOST_FIELD)
+        if number is None or "x" not in geometry:
+            continue
+        numbers.append(float(number))
+        points.append((geometry["x"], geometry["y"]))
+
+    return RouteGeometry(coords, measures, milepost_measures(coords, measures, numbers, points, offsets), offsets)
+
+
+# --- Memory-mapped route store ---
+class RouteStore:
+    """
+    Read-only view of a route store written by sync_route_store().
+
+    Layout of one store generation:
+        coords.f64     float64 (N, 2) lon/lat vertices of every route, back to back
+        measures.f64   float64 (N,) measure at each vertex
+        mileposts.f64  float64 (M, 2) [milepost number, measure] rows, grouped by route
+        index.json     route name -> vertex offsets, part offsets (relative to the
+                       route's first vertex) and milepost offsets, plus Route_ID -> name
+
+    Raises:
+        ValueError: If the generation was written with another store layout.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "index.json"), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") != ROUTE_STORE_VERSION:
+            raise ValueError(f"Route store {path} has layout version {index.get('version')}; run `python lrs.py sync`")
+        self.built = index["built"]
+        self.routes = index["routes"]
+        self.route_ids = index["route_ids"]
+        self.route_names = sorted(self.routes, key=lambda name: name.lower())
+        self.coords = self._open("coords.f64", (index["vertex_count"], 2))
+        self.measures = self._open("measures.f64", (index["vertex_count"],))
+        self.mileposts = self._open("mileposts.f64", (index["milepost_count"], 2))
+
+    def _open(self, name: str, shape: tuple):
+        if shape[0] == 0:
+            return np.empty(shape, dtype=np.float64)
+        return np.memmap(os.path.join(self.path, name), dtype=np.float64, mode="r", shape=shape)
+
+    def get(self, route_name: str = None, route_id: str = None) -> RouteGeometry:
+        """
+        Return a route by Route_Name_Unique or Route_ID, or None if it isn't in the store.
+        The vertex and measure arrays are zero-copy slices of the memory map.
+        """
+        if route_name is None:
+            route_name = self.route_ids.get(str(route_id))
+        entry = self.routes.get(route_name)
+        if entry is None:
+            return None
+        v0, v1 = entry["vertices"]
+        m0, m1 = entry["mileposts"]
+        table = self.mileposts[m0:m1]
+        mileposts = dict(zip(table[:, 0].tolist(), table[:, 1].tolist()))
+        return RouteGeometry(self.coords[v0:v1], self.measures[v0:v1], mileposts, entry["parts"])
+
+    def milepost_numbers(self, route_name: str) -> list:
+        """Return a route's milepost numbers in ascending order."""
+        entry = self.routes.get(route_name)
+        if entry is None:
+            return []
+        m0, m1 = entry["mileposts"]
+        return sorted(self.mileposts[m0:m1, 0].tolist())
+
+
+def sync_route_store(store_dir: str = ROUTE_STORE_DIR) -> str:
+    """
+    Download every route and milepost and write a new store generation.
+
+    The generation is written to its own, uniquely named directory and then published by
+    atomically replacing the CURRENT pointer file, so readers never see a
+    partially written store. Older generations other than the previous one
+    are removed.
+
+    Returns:
+        str: The path of the new generation.
+    """
+    route_parts = defaultdict(list)
+    route_ids = {}
+    for feature in iter_query_features(
+        MILEPOSTS_URL, ROUTES_LAYER, out_fields=f"{ROUTE_ID_FIELD},{ROUTE_NAME_FIELD}",
+        return_geometry=True, extra_params={"returnM": "true"}
+    ):
+        attributes = feature.get("attributes", {})
+        name = attributes.get(ROUTE_NAME_FIELD)
+        if name is None:
+            continue
+        route_parts[name].extend(feature.get("geometry", {}).get("paths", []))
+        if attributes.get(ROUTE_ID_FIELD) is not None:
+            route_ids[str(attributes[ROUTE_ID_FIELD])] = name
+
+    route_mileposts = defaultdict(lambda: ([], []))
+    for feature in iter_query_features(
+        MILEPOSTS_URL, MILEPOSTS_LAYER, out_fields=f"{ROUTE_NAME_FIELD},{MILEPOST_FIELD}",
+        return_geometry=True, max_workers=4
+    ):
+        attributes = feature.get("attributes", {})
+        geometry = feature.get("geometry", {})
+        if attributes.get(MILEPOST_FIELD) is None or "x" not in geometry:
+            continue
+        numbers, points = route_mileposts[attributes.get(ROUTE_NAME_FIELD)]
+        numbers.append(float(attributes[MILEPOST_FIELD]))
+        points.append((geometry["x"], geometry["y"]))
+
+    coords_parts, measures_parts, milepost_rows = [], [], []
+    routes = {}
+    vertex_offset = milepost_offset = 0
+    for name in sorted(route_parts):
+        parts = [path for path in route_parts[name] if len(path) >= 2]
+        if not parts:
+            continue
+        coords, measures, offsets = route_arrays(parts)
+        located = milepost_measures(coords, measures, *route_mileposts.get(name, ([], [])), offsets)
+        rows = np.array(sorted(located.items()), dtype=np.float64).reshape(-1, 2)
+
+        routes[name] = {
+            "vertices": [vertex_offset, vertex_offset + len(coords)],
+            "parts": offsets.tolist(),
+            "mileposts": [milepost_offset, milepost_offset + len(rows)],
+        }
+        coords_parts.append(coords)
+        measures_parts.append(measures)
+        milepost_rows.append(rows)
+        vertex_offset += len(coords)
+        milepost_offset += len(rows)
+
+    # A fresh directory per sync, so two syncs never write into the generation CURRENT points to
+    os.makedirs(store_dir, exist_ok=True)
+    generation = tempfile.mkdtemp(prefix=f"{int(time.time())}-", dir=store_dir)
+    arrays = {
+        "coords.f64": np.vstack(coords_parts) if coords_parts else np.empty((0, 2)),
+        "measures.f64": np.concatenate(measures_parts) if measures_parts else np.empty(0),
+        "mileposts.f64": np.vstack(milepost_rows) if milepost_rows else np.empty((0, 2)),
+    }
+    for file_name, array in arrays.items():
+        np.ascontiguousarray(array, dtype=np.float64).tofile(os.path.join(generation, file_name))
+
+    with open(os.path.join(generation, "index.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": ROUTE_STORE_VERSION,
+            "built": time.time(),
+            "vertex_count": vertex_offset,
+            "milepost_count": milepost_offset,
+            "routes": routes,
+            "route_ids": route_ids,
+        }, f)
+
+    # Publish the new generation, keeping the previous one for readers that still have it open
+    current_path = os.path.join(store_dir, "CURRENT")
+    previous = None
+    if os.path.exists(current_path):
+        with open(current_path, "r", encoding="utf-8") as f:
+            previous = f.read().strip()
+    with open(f"{current_path}.tmp", "w", encoding="utf-8") as f:
+        f.write(os.path.basename(generation))
+    os.replace(f"{current_path}.tmp", current_path)
+
+    for name in os.listdir(store_dir):
+        path = os.path.join(store_dir, name)
+        if os.path.isdir(path) and name not in (os.path.basename(generation), previous):
+            shutil.rmtree(path, ignore_errors=True)
+
+    return generation
+
+
+_route_store = None
+_route_store_lock = threading.Lock()
+
+
+def get_route_store(store_dir: str = ROUTE_STORE_DIR) -> RouteStore:
+    """
+    Return the process-wide RouteStore for the current generation, or None if
+    no store has been synced. A newer generation is picked up automatically.
+    """
+    global _route_store
+    current_path = os.path.join(store_dir, "CURRENT")
+    try:
+        with open(current_path, "r", encoding="utf-8") as f:
+            generation = os.path.join(store_dir, f.read().strip())
+    except OSError:
+        return None
+
+    with _route_store_lock:
+        if _route_store is None or _route_store.path != generation:
+            try:
+                _route_store = RouteStore(generation)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Route store unavailable, using AGOL: %s", e)
+                return None
+        return _route_store
+
+
+def get_route_geometry(route_name: str) -> RouteGeometry:
+    """
+    Return a route's RouteGeometry from the memory-mapped store if one has been
+    synced, otherwise from the shared reference cache, loading it from AGOL on a miss.
+    """
+    from reference_cache import reference_cache
+
+    store = get_route_store()
+    route = store.get(route_name) if store else None
+    if route is not None:
+        return route
+    return reference_cache.get_or_load(("lrs", route_name), lambda: load_route_geometry(route_name))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Linear referencing route store tools.")
+    parser.add_argument("command", choices=["sync"], help="sync: download all routes and mileposts into the store")
+    parser.add_argument("--store-dir", default=ROUTE_STORE_DIR, help="Directory for the route store")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    path = sync_route_store(args.store_dir)
+    logger.info("Route store written to %s", path)
@@ -3,13 +3,114 @@ Utility functions for using Folium maps inside Streamlit apps.
 
 This module provides a helper to add a compact geocoder search box
 to a Folium map, styled with smaller width and font size.
+
+Display-only point and route maps are rendered once to HTML and cached by
+(geometry hash, style, zoom), so reruns and other sessions showing the same
+geometry reuse the finished map document. The map is shown as a static
+component, so panning and zooming never rerun the script.
 """
 
+import threading
+from collections import OrderedDict
 import streamlit as st
-from streamlit_folium import st_folium
+import streamlit.components.v1 as components
 import folium
-from folium.plugins import Search, Draw, Geocoder
+from folium.plugins import Geocoder
 import math
+import numpy as np
+from apex_core.geometry import as_paths, simplify_route, geometry_hash, SIMPLIFY_TOLERANCE_M
+
+
+MAP_HTML_CACHE_SIZE = 64
+MAP_PRECISION = 5          # decimal places of coordinates sent to the browser (~1 m)
+ROUTE_COLOR = "#3388ff"    # Leaflet default blue
+
+_map_html = OrderedDict()  # (geometry hash, style, zoom, ...) -> rendered map HTML
+_map_html_lock = threading.Lock()
+
+
+def _trim(coords) -> list:
+    """Round coordinates to MAP_PRECISION so the map script stays small."""
+    return np.round(np.asarray(coords, dtype=float), MAP_PRECISION).tolist()
+
+
+def _show_cached_map(key: tuple, build, width: int, height: int):
+    """Render the map built by ``build()`` once per key and show the cached HTML."""
+    with _map_html_lock:
+        html = _map_html.get(key)
+        if html is not None:
+            _map_html.move_to_end(key)
+
+    if html is None:
+        html = build().get_root().render()
+        with _map_html_lock:
+            _map_html[key] = html
+            while len(_map_html) > MAP_HTML_CACHE_SIZE:
+                _map_html.popitem(last=False)
+
+    components.html(html, width=width, height=height)
+
+
+def show_point_map(points: list, zoom: int = 12, style: str = "blue", geocoder: bool = True,
+                   width: int = 700, height: int = 500):
+    """
+    Show one or more [lat, lon] points on a cached display map.
+
+    Parameters
+    ----------
+    points : list
+        [lat, lon] pairs.
+    zoom : int, default 12
+        Zoom level for a single point; several points are fit to their bounds.
+    style : str, default "blue"
+        "blue" for a blue marker with an "Uploaded Point" tooltip, "default"
+        for Leaflet's default marker.
+    geocoder : bool, default True
+        Add the small geocoder search box.
+    """
+    points = _trim(points)
+
+    def build():
+        m = folium.Map(location=points[0], zoom_start=zoom)
+        for lat, lon in points:
+            if style == "blue":
+                folium.Marker([lat, lon], icon=folium.Icon(color="blue"), tooltip="Uploaded Point").add_to(m)
+            else:
+                folium.Marker(location=[lat, lon]).add_to(m)
+        if len(points) > 1:
+            lats, lons = zip(*points)
+            m.fit_bounds([[min(lats), min(lons)], [max(lats), max(lons)]])
+        if geocoder:
+            add_small_geocoder(m)
+        return m
+
+    _show_cached_map(("point", geometry_hash(points), style, zoom, geocoder, width, height), build, width, height)
+
+
+def show_route_map(route, geocoder: bool = True, width: int = 700, height: int = 500):
+    """
+    Show a route (one path or a list of paths of [lat, lon] pairs) on a cached
+    display map, zoomed to the route.
+    """
+    paths = [_trim(path) for path in as_paths(route)]
+    bounds = set_bounds_route(paths)   # [[min_lon, min_lat], [max_lon, max_lat]] for [lat, lon] input
+    zoom = set_zoom(bounds)
+
+    def build():
+        m = folium.Map(location=paths[0][0], zoom_start=zoom)
+        folium.PolyLine(
+            paths if len(paths) > 1 else paths[0],
+            color=ROUTE_COLOR,
+            weight=8,
+            opacity=1
+        ).add_to(m)
+        if geocoder:
+            add_small_geocoder(m)
+        m.fit_bounds([[bounds[0][1], bounds[0][0]], [bounds[1][1], bounds[1][0]]])
+        return m
+
+    _show_cached_map(("route", geometry_hash(paths), "line", zoom, geocoder, width, height), build, width, height)
+
 
 
 def add_small_geocoder(fmap, position: str = "topright", width_px: int = 120, font_px: int = 12):
@@ -44,8 +145,8 @@ def add_small_geocoder(fmap, position: str = "topright", width_px: int = 120, fo
 
 def set_bounds_route(route):
     """
-    Given a polyline geometry (a list of points in (lon, lat) order),
-    compute the overall bounding box.
+    Given a polyline geometry (a list of points in (lon, lat) order, or a
+    list of such paths for a multipart route), compute the overall bounding box.
 
     Example input:
         [
@@ -66,8 +167,8 @@ def set_bounds_route(route):
     max_lat = float('-inf')
     max_lon = float('-inf')
 
-    # Iterate directly over the list of (lon, lat) tuples
-    for point in route:
+    # Iterate over the (lon, lat) tuples of every path
+    for point in (point for path in as_paths(route) for point in path):
         if isinstance(point, (list, tuple)) and len(point) == 2:
             lon, lat = point
         else:
@@ -92,6 +193,28 @@ def set_bounds_route(route):
 
 
 
+def display_route(route, report: bool = True):
+    """
+    Return the simplified copy of a route to draw on a map.
+
+    Parameters
+    ----------
+    route : list
+        The full-resolution route as stored in selected_route.
+    report : bool, default True
+        Show a caption with the vertex reduction when the route was simplified.
+    """
+    simplified = simplify_route(route)
+    if report and simplified.vertices_after < simplified.vertices_before:
+        st.caption(
+            f"Route simplified from {simplified.vertices_before:,} to {simplified.vertices_after:,} vertices "
+            f"({SIMPLIFY_TOLERANCE_M:g} m tolerance) for the map and geography queries. "
+            "The full-resolution route is saved with the project."
+        )
+    return simplified.route
+
+
+
 def add_bottom_message(m, message: str):
     """
     Add a persistent bottom message bar to a Folium map.
@@ -0,0 +1,158 @@
+"""
+Cross-session cache for slowly changing reference lists (communities, route
+names, mileposts).
+
+Entries live in a size-bounded in-memory LRU shared by every session in the
+process, backed by an optional on-disk tier so a restarted server doesn't
+have to refetch them. Each entry expires after its TTL and the whole cache
+can be cleared from the UI with the "Refresh reference data" button.
+"""
+
+import os
+import time
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import streamlit as st
+from apex_core.agol import get_multiple_fields, get_unique_field_values
+
+
+REFERENCE_TTL = 24 * 3600      # seconds
+REFERENCE_MAX_ENTRIES = 256
+KEY_LOCK_STRIPES = 64          # loader locks; keys sharing a stripe load one at a time
+REFERENCE_CACHE_DIR = os.environ.get("APEX_REFERENCE_CACHE_DIR", os.path.join(".cache", "reference"))
+
+logger = logging.getLogger("reference_cache")
+
+
+class ReferenceCache:
+    """
+    Thread-safe TTL + LRU cache with an optional disk tier.
+
+    Args:
+        max_entries (int, optional): Maximum entries kept in memory; the least
+            recently used entry is evicted first.
+        default_ttl (int, optional): Seconds an entry stays valid.
+        disk_dir (str, optional): Directory for the disk tier. None keeps the
+            cache in memory only.
+    """
+
+    def __init__(self, max_entries: int = REFERENCE_MAX_ENTRIES, default_ttl: int = REFERENCE_TTL,
+                 disk_dir: str = None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()   # key -> (expires, value)
+        self._lock = threading.Lock()
+        # A fixed set of striped locks, so loader locks don't accumulate for evicted keys
+        self._key_locks = [threading.Lock() for _ in range(KEY_LOCK_STRIPES)]
+
+    def _disk_path(self, key: tuple) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.pkl")
+
+    def _read_disk(self, key: tuple):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                stored_key, expires, value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if stored_key != key or expires <= time.time():
+            return None
+        return expires, value
+
+    def _write_disk(self, key: tuple, expires: float, value):
+        if not self.disk_dir:
+            return
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            path = self._disk_path(key)
+            with open(f"{path}.tmp", "wb") as f:
+                pickle.dump((key, expires, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.warning("Could not write reference cache entry to disk: %s", e)
+
+    def _put(self, key: tuple, expires: float, value):
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_memory(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def get_or_load(self, key: tuple, loader, ttl: int = None):
+        """
+        Return the cached value for ``key``, calling ``loader()`` on a miss.
+
+        Concurrent misses for the same key run the loader once.
+        """
+        entry = self._get_memory(key)
+        if entry is not None:
+            return entry[1]
+
+        key_lock = self._key_locks[hash(key) % len(self._key_locks)]
+        with key_lock:
+            # Another thread may have loaded it while we waited
+            entry = self._get_memory(key) or self._read_disk(key)
+            if entry is None:
+                value = loader()
+                entry = (time.time() + (ttl or self.default_ttl), value)
+                self._write_disk(key, *entry)
+            self._put(key, *entry)
+            return entry[1]
+
+    def clear(self):
+        """Drop every entry from memory and disk."""
+        with self._lock:
+            self._entries.clear()
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".pkl"):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, name))
+                    except OSError:
+                        pass
+
+
+reference_cache = ReferenceCache(disk_dir=REFERENCE_CACHE_DIR)
+
+
+def cached_multiple_fields(url: str, layer: int, fields: list, where: str = "1=1", ttl: int = None) -> list:
+    """Cached get_multiple_fields(), keyed by (service, layer, fields, where)."""
+    key = ("fields", url.rstrip("/"), str(layer), tuple(fields or ()), where)
+    return list(reference_cache.get_or_load(
+        key, lambda: get_multiple_fields(url, layer, fields, where=where), ttl
+    ))
+
+
+def cached_unique_field_values(url: str, layer, field: str, where: str = "1=1", sort_type: str = None,
+                               sort_order: str = "asc", ttl: int = None) -> list:
+    """Cached get_unique_field_values(), keyed by (service, layer, field, where, sort)."""
+    key = ("unique", url.rstrip("/"), str(layer), field, where, sort_type, sort_order)
+    return list(reference_cache.get_or_load(
+        key,
+        lambda: get_unique_field_values(url, layer, field, where=where, sort_type=sort_type, sort_order=sort_order),
+        ttl
+    ))
+
+
+def reference_refresh_button():
+    """Render a button that clears the reference cache and reruns the app."""
+    if st.button("🔄 Refresh reference data", help="Reload community, route and milepost lists from AGOL"):
+        reference_cache.clear()
+        st.rerun()
@@ -1,8 +1,7 @@
 # review.py
 import streamlit as st
-from streamlit_folium import st_folium
-import folium
-from map import set_bounds_route, set_zoom
+from map import display_route, show_point_map, show_route_map
+from apex_core.geometry import as_points
 
 # # ----------------------------------------------------------------------
 # # Dialog for confirmation
@@ -73,24 +72,12 @@ def review_information():
     # --- Map of Location ---
     header_with_edit("PROJECT LOCATION", target_step=4, help="Edit Project Loaction")
     if "selected_point" in st.session_state and st.session_state["selected_point"]:
-        lat, lon = st.session_state["selected_point"]
-        m = folium.Map(location=[lat, lon], zoom_start=12)
-        folium.Marker(location=[lat, lon]).add_to(m)
-        st_folium(m, width=700, height=400)
+        points = as_points(st.session_state["selected_point"])
+        show_point_map(points, style="default", geocoder=False, height=400)
 
     elif "selected_route" in st.session_state and st.session_state["selected_route"]:
-        BLUE = "#3388ff"
-        coords = st.session_state['selected_route']
-        bounds = set_bounds_route(coords)
-        m = folium.Map(location=[coords[0][1], coords[0][0]], zoom_start=set_zoom(bounds))
-        folium.PolyLine(
-            coords,
-            color=BLUE,
-            weight=8,
-            opacity=1
-        ).add_to(m)
-        m.fit_bounds(set_bounds_route( bounds))
-        st_folium(m, width=700, height=400)
+        coords = display_route(st.session_state['selected_route'], report=False)
+        show_route_map(coords, geocoder=False, height=400)
 
     else:
         st.info("No location data available to display a map.")
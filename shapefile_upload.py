@@ -2,17 +2,109 @@
 Utility for uploading and displaying shapefiles in a Streamlit app.
 
 This module lets users upload zipped shapefiles containing point or polyline geometry.
-It extracts the file, reads it with GeoPandas, and displays the geometry on
-an interactive Folium map inside Streamlit, with a bottom message bar showing details.
+The archive is read straight from the uploaded bytes with pyogrio. Every feature is
+used: points become the project's site points and line segments are merged into as
+few route paths as possible. The geometry is displayed on an interactive Folium map inside Streamlit, with a bottom message
+bar showing details.
 """
 
+import hashlib
+import threading
+from collections import OrderedDict
+import shapely
 import streamlit as st
-import tempfile
-import zipfile
-from streamlit_folium import st_folium
-import folium
-import geopandas as gpd
-from map import add_small_geocoder, set_bounds_route, add_bottom_message, set_zoom
+import pyogrio
+from apex_core.geometry import (
+    to_lonlat, to_latlon_list, to_latlon_paths, merge_lines, as_points, from_points, from_paths
+)
+from map import display_route, show_point_map, show_route_map
+
+
+SHAPEFILE_CACHE_SIZE = 16
+SHAPEFILE_CACHE_MAX_BYTES = 64 * 1024 * 1024   # estimated geometry size across all cached uploads
+
+_parsed_uploads = OrderedDict()   # (content hash, columns, max_features) -> (GeoDataFrame, estimated bytes)
+_parsed_uploads_bytes = 0
+_parsed_uploads_lock = threading.Lock()
+
+
+def _estimated_bytes(gdf) -> int:
+    """Rough in-memory size of a parsed upload: 16 bytes per (x, y) coordinate."""
+    return int(shapely.get_num_coordinates(gdf.geometry.to_numpy()).sum()) * 16
+
+
+def read_shapefile_bytes(data: bytes, columns: list = None, max_features: int = None):
+    """
+    Read a zipped shapefile from memory.
+
+    GDAL opens the archive through /vsimem/ and /vsizip/, so the upload is never
+    written or extracted to disk. Parsed results are cached by content hash, so
+    the same upload is only parsed once across reruns and sessions. The cache
+    holds at most SHAPEFILE_CACHE_SIZE uploads and SHAPEFILE_CACHE_MAX_BYTES of
+    geometry; a larger upload is parsed but not kept.
+
+    Args:
+        data (bytes): The zipped shapefile.
+        columns (list, optional): Attribute columns to read. Defaults to none
+            (geometry only).
+        max_features (int, optional): Read at most this many features. Defaults
+            to all of them.
+
+    Returns:
+        GeoDataFrame: The features read from the shapefile.
+
+    Raises:
+        pyogrio.errors.DataSourceError: If the archive isn't a readable shapefile.
+    """
+    global _parsed_uploads_bytes
+    key = (hashlib.blake2b(data, digest_size=16).hexdigest(), tuple(columns or ()), max_features)
+    with _parsed_uploads_lock:
+        if key in _parsed_uploads:
+            _parsed_uploads.move_to_end(key)
+            return _parsed_uploads[key][0]
+
+    gdf = pyogrio.read_dataframe(data, columns=list(columns or ()), max_features=max_features)
+
+    size = _estimated_bytes(gdf)
+    if size > SHAPEFILE_CACHE_MAX_BYTES:
+        return gdf
+
+    with _parsed_uploads_lock:
+        if key not in _parsed_uploads:
+            _parsed_uploads[key] = (gdf, size)
+            _parsed_uploads_bytes += size
+        while len(_parsed_uploads) > SHAPEFILE_CACHE_SIZE or _parsed_uploads_bytes > SHAPEFILE_CACHE_MAX_BYTES:
+            _, (_, evicted) = _parsed_uploads.popitem(last=False)
+            _parsed_uploads_bytes -= evicted
+    return gdf
+
+
+def _read_new_upload(uploaded, state_key: str):
+    """
+    Parse an uploaded shapefile unless it was already handled on an earlier rerun.
+
+    Returns:
+        GeoDataFrame: The features of the upload, or None if this file has
+            already been processed or could not be read.
+    """
+    if st.session_state.get(state_key) == uploaded.file_id:
+        return None
+
+    try:
+        gdf = read_shapefile_bytes(uploaded.getvalue())
+    except Exception as e:
+        st.error(f"Could not read the uploaded shapefile: {e}")
+        return None
+    # Only remember files that parsed, so a failed read is retried and its error stays visible
+    st.session_state[state_key] = uploaded.file_id
+
+    gdf = gdf[~(gdf.geometry.isna() | gdf.geometry.is_empty)]
+    if gdf.empty:
+        st.warning("Uploaded shapefile contains no features.")
+        return None
+    if gdf.crs is None:
+        st.warning("Uploaded shapefile has no .prj file; coordinates are assumed to be WGS84 longitude/latitude.")
+    return gdf
 
 
 def point_shapefile():
@@ -23,36 +115,25 @@ def point_shapefile():
 
 
     # ✅ If a new file is uploaded, process and store it
-    if uploaded:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            zip_path = f"{tmpdir}/shapefile.zip"
-            with open(zip_path, "wb") as f:
-                f.write(uploaded.getbuffer())
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                zip_ref.extractall(tmpdir)
-
-            gdf = gpd.read_file(tmpdir)
-
-            if gdf.geom_type.iloc[0] == "Point":
-                coords = gdf.geometry.iloc[0].coords[0]
-                lat, lon = coords[1], coords[0]
-
-                # Store selected point in session state
-                st.session_state.selected_point = [round(lat, 6), round(lon, 6)]
-                st.session_state.point_shapefile_uploaded = True
-            else:
-                st.warning("Uploaded shapefile is not point geometry.")
-                st.session_state.point_shapefile_uploaded = False
+    gdf = _read_new_upload(uploaded, "point_shapefile_id") if uploaded else None
+    if gdf is not None:
+        if set(gdf.geom_type) <= {"Point", "MultiPoint"}:
+            # Reproject from the shapefile's CRS and store the site point(s) in session state
+            lonlat = to_lonlat(shapely.get_coordinates(gdf.geometry.to_numpy()), gdf.crs)
+            points = to_latlon_list(lonlat)
+            st.session_state.selected_point = from_points(points)
+            st.session_state.point_shapefile_uploaded = True
+            if len(points) > 1:
+                st.info(f"Loaded {len(points)} site points.")
+        else:
+            st.warning("Uploaded shapefile is not point geometry.")
+            st.session_state.point_shapefile_uploaded = False
 
     # ✅ If a point shapefile was uploaded earlier, display it again
     if st.session_state.get("point_shapefile_uploaded") and st.session_state.get("selected_point"):
         st.write("")
         st.markdown("<h5>Review Mapped Point</h5>", unsafe_allow_html=True)
-        lat, lon = st.session_state.selected_point
-        m = folium.Map(location=[lat, lon], zoom_start=12)
-        folium.Marker([lat, lon], icon=folium.Icon(color="blue"), tooltip="Uploaded Point").add_to(m)
-        add_small_geocoder(m)
-        st_folium(m, width=700, height=500)
+        show_point_map(as_points(st.session_state.selected_point))
 
 
 def polyline_shapefile():
@@ -62,40 +143,22 @@ def polyline_shapefile():
         "(.shp, .shx, .dbf, .prj).", type=["zip"])
 
     # ✅ If a new file is uploaded, process and store it
-    if uploaded:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            zip_path = f"{tmpdir}/shapefile.zip"
-            with open(zip_path, "wb") as f:
-                f.write(uploaded.getbuffer())
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                zip_ref.extractall(tmpdir)
-
-            gdf = gpd.read_file(tmpdir)
-
-            if gdf.geom_type.iloc[0] == "LineString":
-                coords = list(gdf.geometry.iloc[0].coords)
-                formatted = [[round(lat, 6), round(lon, 6)] for lon, lat in coords]
-                st.session_state.selected_route = formatted
-                st.session_state.route_shapefile_uploaded = True
-            else:
-                st.warning("Uploaded shapefile is not polyline geometry.")
-                st.session_state.route_shapefile_uploaded = False
+    gdf = _read_new_upload(uploaded, "route_shapefile_id") if uploaded else None
+    if gdf is not None:
+        if set(gdf.geom_type) <= {"LineString", "MultiLineString"}:
+            # Join contiguous segments, then reproject every path in one pass
+            paths = to_latlon_paths(merge_lines(gdf.geometry.to_numpy()), gdf.crs)
+            st.session_state.selected_route = from_paths(paths)
+            st.session_state.route_shapefile_uploaded = True
+            if len(gdf) > 1 or len(paths) > 1:
+                st.info(f"Merged {len(gdf)} line features into {len(paths)} route path(s).")
+        else:
+            st.warning("Uploaded shapefile is not polyline geometry.")
+            st.session_state.route_shapefile_uploaded = False
 
     # ✅ If a polyline shapefile was uploaded earlier, display it again
     if st.session_state.get("route_shapefile_uploaded") and st.session_state.get("selected_route"):
         #coords = [(lon, lat) for lat, lon in st.session_state.selected_route]
         st.write("")
         st.markdown("<h5>Review Mapped Route</h5>", unsafe_allow_html=True)
-        coords = st.session_state['selected_route']
-        bounds = set_bounds_route(coords)
-        m = folium.Map(location=[coords[1][0], coords[1][0]], zoom_start=set_zoom(bounds))
-        # ✅ Updated PolyLine symbology
-        folium.PolyLine(
-            coords,                # list of [lat, lon] pairs
-            color="#3388ff",       # Leaflet default blue
-            weight=8,              # line thickness
-            opacity=1           # transparency
-        ).add_to(m)
-        add_small_geocoder(m)
-        m.fit_bounds(set_bounds_route(bounds))
-        st_folium(m, width=700, height=500)
+        show_route_map(display_route(st.session_state['selected_route']))
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+import lrs
+from lrs import RouteGeometry, milepost_measures, route_arrays
+
+
+# Two parts listed out of order: the second covers measures 0-10, the first 10-20
+OUT_OF_ORDER_M = [
+    [[0.0, 0.0, 10.0], [0.0, 1.0, 20.0]],
+    [[0.0, 1.0, 0.0], [0.0, 0.0, 10.0]],
+]
+
+# Two disjoint parts without M values, listed out of order
+OUT_OF_ORDER_XY = [
+    [[0.0, 2.0], [0.0, 3.0]],
+    [[0.0, 0.0], [0.0, 1.0]],
+]
+
+
+def test_route_arrays_orders_parts_by_measure():
+    coords, measures, offsets = route_arrays(OUT_OF_ORDER_M)
+
+    assert offsets.tolist() == [0, 2, 4]
+    assert measures.tolist() == [0.0, 10.0, 10.0, 20.0]
+    assert coords.tolist() == [[0.0, 1.0], [0.0, 0.0], [0.0, 0.0], [0.0, 1.0]]
+
+
+def test_route_arrays_without_m_does_not_measure_gaps():
+    coords, measures, offsets = route_arrays(OUT_OF_ORDER_XY)
+
+    assert offsets.tolist() == [0, 2, 4]
+    first, second = np.diff(measures[0:2])[0], np.diff(measures[2:4])[0]
+    # Each part is one degree of latitude (~69 miles); the one-degree gap adds nothing
+    assert first == pytest.approx(69.1, abs=0.1)
+    assert second == pytest.approx(69.1, abs=0.1)
+    assert measures[2] == measures[1]
+
+
+def test_segment_interpolates_inside_the_part_holding_the_measure():
+    coords, measures, offsets = route_arrays(OUT_OF_ORDER_M)
+    route = RouteGeometry(coords, measures, {5.0: 5.0, 15.0: 15.0}, offsets)
+
+    # The parts meet at (0, 0), so the segment is a single path
+    assert route.segment(5, 15) == [[0.5, 0.0], [0.0, 0.0], [0.5, 0.0]]
+
+
+def test_segment_never_bridges_a_gap():
+    coords, measures, offsets = route_arrays(OUT_OF_ORDER_XY)
+    numbers = [1.0, 2.0]
+    points = [[0.0, 0.5], [0.0, 2.5]]
+    route = RouteGeometry(coords, measures, milepost_measures(coords, measures, numbers, points, offsets), offsets)
+
+    paths = route.segment(1, 2)
+    assert len(paths) == 2
+    for path in paths:
+        latitudes = [lat for lat, _ in path]
+        # No path crosses the gap between latitude 1 and 2
+        assert max(latitudes) <= 1.0 or min(latitudes) >= 2.0
+
+
+def test_milepost_not_on_route_raises():
+    coords, measures, offsets = route_arrays(OUT_OF_ORDER_M)
+    route = RouteGeometry(coords, measures, {5.0: 5.0}, offsets)
+
+    with pytest.raises(ValueError):
+        route.segment(5, 7)
+
+
+def test_route_store_keeps_parts(monkeypatch, tmp_path):
+    routes = [{"attributes": {"Route_ID": "R1", "Route_Name_Unique": "Two Part"},
+               "geometry": {"paths": OUT_OF_ORDER_M}}]
+    mileposts = [{"attributes": {"Route_Name_Unique": "Two Part", "Milepost_Number": 5},
+                  "geometry": {"x": 0.0, "y": 0.5}}]
+    monkeypatch.setattr(
+        lrs, "iter_query_features",
+        lambda url, layer, **kwargs: iter(routes if layer == lrs.ROUTES_LAYER else mileposts)
+    )
+
+    first = lrs.sync_route_store(str(tmp_path))
+    second = lrs.sync_route_store(str(tmp_path))
+    assert first != second
+
+    route = lrs.RouteStore(second).get(route_id="R1")
+    assert route.offsets.tolist() == [0, 2, 4]
+    assert route.measures.tolist() == [0.0, 10.0, 10.0, 20.0]
@@ -0,0 +1,37 @@
+"""
+Streamlit adapters over apex_core.upload for sending the project in
+session_state to the APEX Feature Service.
+
+The draft is taken from session_state on the script thread, so the upload
+workers never touch Streamlit.
+"""
+
+import streamlit as st
+from apex_core import upload as core
+from apex_core.upload import APEX_URL, GEOGRAPHY_LAYERS
+from payloads import current_draft
+
+
+def _report_build_error(name: str, error: Exception):
+    st.error(str(error))
+
+
+def upload_project_atomic(url: str = APEX_URL) -> dict:
+    """
+    Upload the project and all of its child records in one applyEdits transaction.
+
+    Returns:
+        dict: "success", "message", "globalid" and "layers" as returned by
+            apex_core.upload.upload_project_atomic().
+    """
+    return core.upload_project_atomic(current_draft(), url, on_error=_report_build_error)
+
+
+def iter_child_uploads(globalid: str, url: str = APEX_URL, max_workers: int = 4):
+    """
+    Build and load every child layer of the session's project concurrently.
+
+    Yields:
+        tuple: (name, result) for each child layer in completion order.
+    """
+    return core.iter_child_uploads(current_draft(), globalid, url, max_workers)